@@ -1,38 +1,76 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
 
-# Load data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import iter_dataset
+from streaming_stats import GroupedQuantiles
+from threshold_sweep import recommend_threshold, threshold_curve
+
+parser = argparse.ArgumentParser(description='Análisis de la definición de churn.')
+parser.add_argument('--chunksize', type=int, default=100_000,
+                    help='Filas leídas por bloque (la columna nunca se carga completa).')
+parser.add_argument('--error', type=float, default=0.01,
+                    help='Error de rango máximo de los cuantiles aproximados (por defecto 0.01).')
+args = parser.parse_args()
+
+# Stream the data: per-Target quantile sketches plus (days, target) counts
+# for the threshold sweep, so memory does not grow with the dataset
+quantiles = GroupedQuantiles(error=args.error)
+counts = []
 try:
-    df = pd.read_csv('datos/dataset_ecommerce_limpio_es.csv')
+    for chunk in iter_dataset('limpio', args.chunksize, columns=['Dias_Ultima_Compra', 'Target']):
+        quantiles.update(chunk['Dias_Ultima_Compra'], chunk['Target'])
+        counts.append(chunk.groupby(['Dias_Ultima_Compra', 'Target']).size())
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("Error: File not found. Please run EDA first.")
     exit()
+counts = pd.concat(counts).groupby(level=[0, 1]).sum().reset_index(name='Clientes')
 
 # Analysis of Dias_Ultima_Compra vs Target
 print("\n--- Estadísticas de Dias_Ultima_Compra por Target ---")
-print(df.groupby('Target')['Dias_Ultima_Compra'].describe())
+print(f"(cuantiles aproximados, error de rango <= {args.error:g})")
+print(quantiles.describe().rename_axis('Target'))
 
 # Visualizing
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='Target', y='Dias_Ultima_Compra', data=df)
+sns.set_theme()
+fig, ax = plt.subplots(figsize=(10, 6))
+ax.bxp(quantiles.box_stats(), showmeans=False, patch_artist=True,
+       boxprops=dict(facecolor=sns.color_palette()[0]))
 plt.title('Días Desde Última Compra por Estado de Churn')
 plt.xlabel('Target (0=Activo, 1=Churn)')
 plt.ylabel('Días Desde Última Compra')
 plt.savefig('Churn_Definition/dias_ultima_compra_boxplot.png')
 print("\nBoxplot guardado en 'Churn_Definition/dias_ultima_compra_boxplot.png'")
 
-# Check for a potential threshold
+# Check for a potential threshold: one sort, every distinct threshold
 print("\n--- Análisis de Umbral ---")
-for days in [30, 45, 60, 90]:
-    churn_rate_above = df[df['Dias_Ultima_Compra'] > days]['Target'].mean()
-    count_above = df[df['Dias_Ultima_Compra'] > days].shape[0]
-    print(f"Días > {days}: Count={count_above}, Tasa de Churn={churn_rate_above:.2f}")
+curve = threshold_curve(counts['Dias_Ultima_Compra'], counts['Target'], weights=counts['Clientes'])
+for row in threshold_curve(counts['Dias_Ultima_Compra'], counts['Target'], [30, 45, 60, 90],
+                           weights=counts['Clientes']).itertuples():
+    print(f"Días > {row.Umbral:g}: Count={row.Count}, Tasa de Churn={row.Tasa_Churn:.2f}")
+
+# Only thresholds that leave at least 5% of the customers above them
+try:
+    best = recommend_threshold(curve, min_share=0.05)
+except ValueError as error:
+    print(f"Error: {error}")
+    sys.exit(1)
+print(f"\nUmbrales evaluados: {len(curve)}")
+if best is None:
+    print("Sin umbral recomendado: ninguno con al menos el 5% de los clientes separa el churn mejor "
+          "que el azar (J de Youden <= 0); la inactividad no define el churn en estos datos.")
+else:
+    print(f"Umbral recomendado (máximo J de Youden, al menos 5% de los clientes): Días > {best['Umbral']:g} "
+          f"(Count={best['Count']:.0f}, {best['Proporcion']:.1%} de los clientes, "
+          f"Tasa de Churn={best['Tasa_Churn']:.2f}, J={best['J_Youden']:.3f})")
 
 # Check overlap
-min_churn_days = df[df['Target'] == 1]['Dias_Ultima_Compra'].min()
-max_active_days = df[df['Target'] == 0]['Dias_Ultima_Compra'].max()
+min_churn_days = quantiles.sketches[1].min
+max_active_days = quantiles.sketches[0].max
 print(f"\nMín Dias_Ultima_Compra para Target=1: {min_churn_days}")
 print(f"Máx Dias_Ultima_Compra para Target=0: {max_active_days}")
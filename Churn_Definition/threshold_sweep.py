@@ -0,0 +1,78 @@
+"""Vectorized sweep of churn-definition thresholds on Dias_Ultima_Compra.
+
+Instead of filtering the frame once per candidate threshold, the days are
+sorted once and cumulative sums of the target give, for every threshold,
+the number of customers above it and how many of them churned. Cost is
+O(n log n) for the sort plus O(m log n) for m thresholds. With
+``weights`` the rows can be pre-aggregated (distinct days, target) counts,
+e.g. accumulated chunk by chunk.
+"""
+import numpy as np
+import pandas as pd
+
+
+def threshold_curve(days, target, thresholds=None, weights=None):
+    """Customers and churn rate with ``days > threshold`` for each threshold.
+
+    ``thresholds`` defaults to every distinct value of ``days``. Rows with
+    missing days are ignored. ``weights`` gives the number of customers
+    each row stands for (default 1). Returns a DataFrame with one row per
+    threshold: Count and Churn_Count above it, Proporcion (share of the
+    customers above it), Tasa_Churn (churn rate above), TPR/FPR of using
+    ``days > threshold`` as the churn definition, and Youden's J
+    (TPR - FPR).
+    """
+    days = np.asarray(days, dtype=float)
+    target = np.asarray(target, dtype=float)
+    weights = np.ones_like(days) if weights is None else np.asarray(weights, dtype=float)
+    present = ~np.isnan(days)
+    days, target, weights = days[present], target[present], weights[present]
+
+    order = np.argsort(days)
+    sorted_days = days[order]
+    churn_cumsum = np.concatenate([[0.0], np.cumsum(target[order] * weights[order])])
+    count_cumsum = np.concatenate([[0.0], np.cumsum(weights[order])])
+    n = count_cumsum[-1]
+    total_churn = churn_cumsum[-1]
+    total_active = n - total_churn
+
+    if thresholds is None:
+        thresholds = np.unique(sorted_days)
+    thresholds = np.asarray(thresholds, dtype=float)
+    below = np.searchsorted(sorted_days, thresholds, side='right')
+    count = n - count_cumsum[below]
+    churn_count = total_churn - churn_cumsum[below]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        churn_rate = np.where(count > 0, churn_count / count, np.nan)
+        share = count / n if n else np.zeros_like(count)
+        tpr = churn_count / total_churn if total_churn else np.zeros_like(churn_count)
+        fpr = (count - churn_count) / total_active if total_active else np.zeros_like(churn_count)
+    return pd.DataFrame({
+        'Umbral': thresholds,
+        'Count': count.astype('int64'),
+        'Churn_Count': churn_count.astype('int64'),
+        'Proporcion': share,
+        'Tasa_Churn': churn_rate,
+        'TPR': tpr,
+        'FPR': fpr,
+        'J_Youden': tpr - fpr,
+    })
+
+
+def recommend_threshold(curve, min_share=0.05, min_count=1):
+    """Row of ``curve`` with the highest Youden's J among thresholds with at
+    least ``min_share`` of the customers and ``min_count`` customers above
+    them (ties go to the lower threshold), or None when that J is not
+    positive: no threshold separates churn better than chance.
+
+    Without a minimum support the tail wins: a threshold above which a
+    single churner remains has FPR 0 and a positive J. Raises ValueError
+    when no threshold has the minimum support.
+    """
+    eligible = curve[(curve['Proporcion'] >= min_share) & (curve['Count'] >= min_count)]
+    if eligible.empty:
+        raise ValueError(f"Ningún umbral deja al menos el {min_share:.0%} de los clientes "
+                         f"({min_count} como mínimo) por encima.")
+    best = eligible.loc[eligible['J_Youden'].idxmax()]
+    return best if best['J_Youden'] > 0 else None
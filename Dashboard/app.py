@@ -1,3 +1,6 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -5,6 +8,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import RISK_SEGMENTS, load_dataset
+from importance import load_importance
+from streaming_stats import GroupedQuantiles
+
 # Page configuration
 st.set_page_config(
     page_title="Análisis de Churn E-commerce",
@@ -139,7 +147,7 @@ st.markdown("""
 @st.cache_data
 def load_data():
     try:
-        df = pd.read_csv('datos/dataset_ecommerce_segmentado_es.csv')
+        df = load_dataset('segmentado')
         return df
     except FileNotFoundError:
         st.error("❌ Error: Dataset no encontrado. Por favor ejecuta el script de segmentación primero.")
@@ -147,6 +155,16 @@ def load_data():
 
 df = load_data()
 
+# Permutation importance cached next to the registered model (importance.py)
+@st.cache_data
+def load_feature_importance():
+    try:
+        return load_importance()['Importancia']
+    except FileNotFoundError:
+        return None
+
+feature_importance = load_feature_importance()
+
 # Sidebar with improved styling
 with st.sidebar:
     st.markdown("# 🎯 Controles del Dashboard")
@@ -157,8 +175,8 @@ with st.sidebar:
     # Risk Segment Filter
     risk_filter = st.multiselect(
         "🎚️ Segmento de Riesgo",
-        options=df['Segmento_Riesgo'].unique(),
-        default=df['Segmento_Riesgo'].unique(),
+        options=df['Segmento_Riesgo'].unique().tolist(),
+        default=df['Segmento_Riesgo'].unique().tolist(),
         help="Filtrar clientes por nivel de riesgo"
     )
     
@@ -370,45 +388,39 @@ with tab2:
     st.markdown("### 🎯 Análisis de Importancia de Features")
     
     # Feature Importance
-    feature_importance = {
-        'Antiguedad': 0.259,
-        'Monto_Cashback': 0.168,
-        'Distancia_Almacen': 0.103,
-        'Numero_Direcciones': 0.086,
-        'Dias_Ultima_Compra': 0.081,
-        'Queja': 0.069,
-        'Nivel_Satisfaccion': 0.066,
-        'Numero_Dispositivos': 0.052
-    }
-    
-    fig = go.Figure(data=[go.Bar(
-        x=list(feature_importance.values()),
-        y=list(feature_importance.keys()),
-        orientation='h',
-        marker=dict(
-            color=list(feature_importance.values()),
-            colorscale='Viridis',
-            showscale=True,
-            colorbar=dict(title="Importancia")
-        ),
-        text=[f'{v:.1%}' for v in feature_importance.values()],
-        textposition='outside',
-        textfont=dict(size=14),
-        hovertemplate='<b>%{y}</b><br>Importancia: %{x:.3f}<extra></extra>'
-    )])
-    fig.update_layout(
-        title={
-            'text': "Top 8 Importancia de Features (Random Forest)",
-            'x': 0.5,
-            'xanchor': 'center',
-            'font': {'size': 22, 'color': '#2c3e50'}
-        },
-        xaxis_title="Puntuación de Importancia",
-        height=500,
-        xaxis=dict(gridcolor='lightgray'),
-        yaxis=dict(tickfont=dict(size=14))
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    if feature_importance is None:
+        st.warning("⚠️ Importancia de features no disponible. Ejecuta Modeling/modeling_pipeline.py "
+                   "o Modeling/permutation_importance.py.")
+    else:
+        top_features = feature_importance.head(8)
+        fig = go.Figure(data=[go.Bar(
+            x=top_features.tolist(),
+            y=top_features.index.tolist(),
+            orientation='h',
+            marker=dict(
+                color=top_features.tolist(),
+                colorscale='Viridis',
+                showscale=True,
+                colorbar=dict(title="Importancia")
+            ),
+            text=[f'{v:.3f}' for v in top_features],
+            textposition='outside',
+            textfont=dict(size=14),
+            hovertemplate='<b>%{y}</b><br>Caída de ROC AUC: %{x:.3f}<extra></extra>'
+        )])
+        fig.update_layout(
+            title={
+                'text': "Top 8 Importancia por Permutación (Random Forest)",
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'size': 22, 'color': '#2c3e50'}
+            },
+            xaxis_title="Caída de ROC AUC al permutar la variable",
+            height=500,
+            xaxis=dict(gridcolor='lightgray'),
+            yaxis=dict(tickfont=dict(size=14))
+        )
+        st.plotly_chart(fig, use_container_width=True)
     
     # Feature Explanations
     st.markdown("### 📝 Explicación de Features")
@@ -515,14 +527,21 @@ with tab3:
     
     # Churn Probability Distribution
     st.markdown("#### 📊 Distribución de Probabilidad de Churn")
+    # Boxes are drawn from per-segment quantile sketches (precomputed
+    # statistics), so plotly does not receive every row
     fig = go.Figure()
     colors = {'Bajo Riesgo': '#27ae60', 'Riesgo Medio': '#f39c12', 'Alto Riesgo': '#e74c3c'}
-    for segment in ['Bajo Riesgo', 'Riesgo Medio', 'Alto Riesgo']:
-        segment_data = df_filtered[df_filtered['Segmento_Riesgo'] == segment]['Probabilidad_Churn']
+    quantiles = GroupedQuantiles(error=0.005).update(
+        df_filtered['Probabilidad_Churn'], df_filtered['Segmento_Riesgo'].astype(str))
+    segments = [segment for segment in RISK_SEGMENTS if segment in quantiles.sketches]
+    for box in quantiles.box_stats(groups=segments):
         fig.add_trace(go.Box(
-            y=segment_data,
-            name=segment,
-            marker=dict(color=colors[segment]),
+            x=[box['label']],
+            q1=[box['q1']], median=[box['med']], q3=[box['q3']],
+            lowerfence=[box['whislo']], upperfence=[box['whishi']],
+            mean=[box['mean']], sd=[box['std']],
+            name=box['label'],
+            marker=dict(color=colors[box['label']]),
             boxmean='sd',
             hovertemplate='<b>%{fullData.name}</b><br>Probabilidad: %{y:.2%}<extra></extra>'
         ))
@@ -2,19 +2,32 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import base64
+import os
+import sys
 from io import BytesIO
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset, translate_columns
+from importance import load_importance
+
 # Set style
 sns.set_palette("husl")
 
-# Load data
+# Load data (English view over the segmented dataset)
 try:
-    df = pd.read_csv('datos/dataset_ecommerce_segmented.csv')
+    df = load_dataset('segmentado', locale='en')
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("Error: Segmented data not found.")
     exit()
 
+# Permutation importance cached next to the registered model (importance.py)
+try:
+    importance = load_importance()['Importancia'].head(8)
+except FileNotFoundError:
+    print("Error: Feature importance not found. Please run Modeling/modeling_pipeline.py first.")
+    exit()
+
 # Function to convert plot to base64
 def plot_to_base64(fig):
     buffer = BytesIO()
@@ -63,24 +76,14 @@ for bar in bars:
             ha='center', va='bottom', fontsize=11, weight='bold')
 charts['risk_bar'] = plot_to_base64(fig)
 
-# 3. Feature Importance (Top 8)
-feature_importance = {
-    'Tenure': 0.259,
-    'CashbackAmount': 0.168,
-    'WarehouseToHome': 0.103,
-    'NumberOfAddress': 0.086,
-    'DaySinceLastOrder': 0.081,
-    'Complain': 0.069,
-    'SatisfactionScore': 0.066,
-    'NumberOfDeviceRegistered': 0.052
-}
+# 3. Feature Importance (Top 8, English column names)
 fig, ax = plt.subplots(figsize=(10, 6))
-features = list(feature_importance.keys())
-importances = list(feature_importance.values())
+features = translate_columns(importance.index, source='es', target='en')
+importances = importance.tolist()
 colors_gradient = plt.cm.viridis([i/len(features) for i in range(len(features))])
 bars = ax.barh(features, importances, color=colors_gradient, edgecolor='black', linewidth=1.2)
-ax.set_xlabel('Importance Score', fontsize=12, weight='bold')
-ax.set_title('Top 8 Feature Importances (Random Forest)', fontsize=14, weight='bold', pad=20)
+ax.set_xlabel('ROC AUC drop when permuted', fontsize=12, weight='bold')
+ax.set_title('Top 8 Permutation Importances (Random Forest)', fontsize=14, weight='bold', pad=20)
 ax.grid(axis='x', alpha=0.3)
 for i, bar in enumerate(bars):
     width = bar.get_width()
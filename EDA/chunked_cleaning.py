@@ -0,0 +1,45 @@
+"""Out-of-core cleaning for eda_script.py (``--chunksize N``).
+
+The dataset is read twice in fixed-size chunks: the first pass collects
+mergeable statistics (null counts, medians, modes, moments)
+and the second imputes each chunk and appends it to the cleaned dataset,
+so peak memory depends on the chunk size and not on the dataset size.
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import DatasetWriter, iter_dataset
+from streaming_stats import StreamingProfile, profile_chunks
+
+
+def impute(chunk, fill_values):
+    """Fill the nulls of ``chunk`` with the global imputation values."""
+    chunk = chunk.copy()
+    for col, value in fill_values.items():
+        if isinstance(chunk[col].dtype, pd.CategoricalDtype) and value not in chunk[col].cat.categories:
+            chunk[col] = chunk[col].cat.add_categories([value])
+    return chunk.fillna(fill_values)
+
+
+def clean_in_chunks(chunksize, source='crudo', target='limpio', n_jobs=1):
+    """Impute ``source`` chunk by chunk and write it as ``target``.
+
+    The statistics of the first pass are computed in ``n_jobs`` processes.
+    Returns the statistics of the raw data, the statistics of the cleaned
+    data, the imputation values and the path written.
+    """
+    # Pass 1: statistics needed for imputation
+    raw_stats = profile_chunks(iter_dataset(source, chunksize), n_jobs=n_jobs)
+    fill_values = raw_stats.fill_values()
+
+    # Pass 2: impute, write and profile the cleaned data
+    clean_stats = StreamingProfile(count_columns=['Target'])
+    with DatasetWriter(target) as writer:
+        for chunk in iter_dataset(source, chunksize):
+            chunk = impute(chunk, fill_values)
+            writer.write(chunk)
+            clean_stats.update(chunk)
+    return raw_stats, clean_stats, fill_values, writer.path
@@ -1,15 +1,68 @@
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset, save_dataset
+from streaming_stats import profile_frame
+from chunked_cleaning import clean_in_chunks
 
 # Set plot style
 sns.set(style="whitegrid")
 
+parser = argparse.ArgumentParser(description='EDA y limpieza del dataset de churn.')
+parser.add_argument('--chunksize', type=int, default=None,
+                    help='Procesar el dataset en bloques de N filas (modo streaming, memoria acotada).')
+parser.add_argument('--jobs', type=int, default=1,
+                    help='Procesos para calcular las estadísticas por particiones en paralelo.')
+args = parser.parse_args()
+
+# Streaming mode: two passes over fixed-size chunks, never the full table in memory
+if args.chunksize:
+    print(f"Modo streaming: bloques de {args.chunksize:,} filas.")
+    try:
+        raw_stats, clean_stats, fill_values, output_path = clean_in_chunks(args.chunksize, n_jobs=args.jobs)
+    except FileNotFoundError:
+        print("Error: File not found.")
+        exit()
+
+    print(f"\nFilas procesadas: {raw_stats.rows:,}")
+
+    print("\n--- Valores Faltantes ---")
+    print(raw_stats.nulls)
+
+    print("\n--- Manejando Valores Faltantes ---")
+    print(f"Columnas con valores faltantes: {list(fill_values)}")
+    for col, value in fill_values.items():
+        if col not in raw_stats.sketches:
+            statistic = 'moda'
+        elif raw_stats.median_is_exact(col):
+            statistic = 'mediana exacta'
+        else:
+            statistic = 'mediana aproximada'
+        print(f"  {col}: imputado con {value} ({statistic})")
+
+    print("Valores faltantes después de imputación:")
+    print(clean_stats.nulls)
+
+    print("\n--- Distribución de la Variable Objetivo (Target) ---")
+    print(clean_stats.frequencies('Target', normalize=True))
+
+    print("\n--- Resumen Numérico (cuantiles aproximados) ---")
+    print(clean_stats.describe())
+
+    print("\n--- Matriz de Correlación ---")
+    print(clean_stats.corr()['Target'].sort_values(ascending=False))
+
+    print(f"\nDataset limpio guardado en '{os.path.relpath(output_path)}'")
+    sys.exit()
+
 # Load data with Spanish columns
 try:
-    df = pd.read_csv('datos/data_ecommerce_customer_churn_es.csv')
+    df = load_dataset('crudo')
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("Error: File not found.")
@@ -22,39 +75,45 @@ print(df.info())
 print("\n--- Primeras 5 filas ---")
 print(df.head())
 
+# Single-scan profile of the raw data (null counts)
+raw_profile = profile_frame(df, n_jobs=args.jobs)
+
 print("\n--- Valores Faltantes ---")
-print(df.isnull().sum())
+print(raw_profile.nulls)
 
 print("\n--- Duplicados ---")
 print(f"Duplicados: {df.duplicated().sum()}")
 
 # 2. Data Cleaning
 print("\n--- Manejando Valores Faltantes ---")
-missing_cols = df.columns[df.isnull().any()].tolist()
+missing_cols = raw_profile.nulls[raw_profile.nulls > 0].index.tolist()
 print(f"Columnas con valores faltantes: {missing_cols}")
 
 for col in missing_cols:
-    if df[col].dtype == 'object':
+    if not pd.api.types.is_numeric_dtype(df[col]):
         df[col] = df[col].fillna(df[col].mode()[0])
     else:
         df[col] = df[col].fillna(df[col].median())
 
+# Single-scan profile of the cleaned data: nulls, frequencies, moments and
+# covariance in one pass (the quartiles come from describe(), exact in memory)
+profile = profile_frame(df, n_jobs=args.jobs, count_columns=['Target'])
+
 print("Valores faltantes después de imputación:")
-print(df.isnull().sum())
+print(profile.nulls)
 
 # 3. Univariate Analysis
 print("\n--- Distribución de la Variable Objetivo (Target) ---")
-print(df['Target'].value_counts(normalize=True))
+print(profile.frequencies('Target', normalize=True))
 
 print("\n--- Resumen Numérico ---")
 print(df.describe())
 
 # 4. Bivariate Analysis
 print("\n--- Matriz de Correlación ---")
-numeric_df = df.select_dtypes(include=[np.number])
-corr_matrix = numeric_df.corr()
+corr_matrix = profile.corr()
 print(corr_matrix['Target'].sort_values(ascending=False))
 
 # Save cleaned data for next steps
-df.to_csv('datos/dataset_ecommerce_limpio_es.csv', index=False)
-print("\nDataset limpio guardado en 'datos/dataset_ecommerce_limpio_es.csv'")
+output_path = save_dataset(df, 'limpio')
+print(f"\nDataset limpio guardado en '{os.path.relpath(output_path)}'")
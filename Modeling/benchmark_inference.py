@@ -0,0 +1,87 @@
+"""Inference benchmark: scikit-learn pipeline vs compiled forest.
+
+Checks that the compiled forest (forest_arrays.py) gives the same
+probabilities as the registered pipeline, then times both on batches
+resampled from the cleaned dataset.
+
+    python Modeling/benchmark_inference.py
+    python Modeling/benchmark_inference.py --lotes 1 100 100000 --repeticiones 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset
+from forest_arrays import ForestScorer, check_parity
+from model_registry import CHURN_MODEL, load_model
+
+
+def best_time(function, repeat):
+    """Best wall time of ``repeat`` calls, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(pipeline, scorer, X, batch_sizes, repeat=20, random_state=42):
+    """Seconds per batch of both engines for each batch size."""
+    results = []
+    for batch_size in batch_sizes:
+        batch = X.sample(batch_size, replace=True, random_state=random_state).reset_index(drop=True)
+        # Large batches take long enough to time with fewer calls
+        calls = max(1, min(repeat, 100_000 // batch_size))
+        sklearn_time = best_time(lambda: pipeline.predict_proba(batch), calls)
+        compiled_time = best_time(lambda: scorer.predict_proba(batch), calls)
+        results.append({
+            'Lote': batch_size,
+            'scikit-learn (ms)': sklearn_time * 1000,
+            'Compilado (ms)': compiled_time * 1000,
+            'Aceleración': sklearn_time / compiled_time,
+            'Filas/s compilado': batch_size / compiled_time,
+        })
+    return pd.DataFrame(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara la inferencia de scikit-learn y del bosque compilado.')
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 100, 100_000],
+                        help='Tamaños de lote a medir (por defecto 1 100 100000).')
+    parser.add_argument('--repeticiones', type=int, default=20,
+                        help='Llamadas por lote; se informa el mejor tiempo.')
+    parser.add_argument('--modelo', default=CHURN_MODEL, help='Nombre del modelo en el registro.')
+    parser.add_argument('--clave', default=None, help='Clave del artefacto (por defecto, el último).')
+    args = parser.parse_args(argv)
+
+    try:
+        X = load_dataset('limpio').drop(columns='Target')
+        pipeline, metadata = load_model(args.modelo, key=args.clave)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. Ejecuta primero Modeling/modeling_pipeline.py.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        scorer = ForestScorer.from_pipeline(pipeline)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    print(f"Modelo {args.modelo} (clave {metadata['key'][:12]}): {scorer.meta['n_trees']} árboles, "
+          f"{scorer.meta['n_nodes']:,} nodos, compilado en {time.perf_counter() - start:.2f}s")
+    difference = check_parity(pipeline, scorer, X)
+    print(f"Paridad con scikit-learn en {len(X):,} filas (y su copia con valores vacíos): "
+          f"diferencia máxima {difference:.2g}")
+
+    results = benchmark(pipeline, scorer, X, args.lotes, args.repeticiones)
+    print("\nTiempo por lote (mejor de varias llamadas):")
+    print(results.to_string(index=False, float_format=lambda value: f'{value:,.2f}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Evaluate a scored file (e.g. the output of batch_scoring.py) against Target.
+
+The file is read in chunks; each chunk is reduced to counts per distinct
+score (evaluation.ScoreCurve) and the counts are merged, so files with
+millions of customers are evaluated without holding them in memory. With
+``--jobs N`` the chunks are reduced in N worker processes.
+
+    python Modeling/evaluate_scores.py clientes_puntuados.parquet
+    python Modeling/evaluate_scores.py clientes_puntuados.parquet --umbrales 0.3 0.5 0.7 --curva curva.csv --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import iter_file
+from evaluation import evaluate_chunks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Métricas y curva por umbral de un archivo puntuado.')
+    parser.add_argument('archivo', help='CSV o Parquet con Target y la probabilidad de churn.')
+    parser.add_argument('--puntuacion', default='Probabilidad_Churn', help='Columna con la probabilidad.')
+    parser.add_argument('--umbrales', type=float, nargs='+', default=[0.3, 0.5, 0.7],
+                        help='Umbrales a detallar (por defecto los de los segmentos de riesgo).')
+    parser.add_argument('--curva', default=None, help='Guardar la curva completa por umbral en este CSV.')
+    parser.add_argument('--decimales', type=int, default=None,
+                        help='Redondear las probabilidades para acotar la memoria (por defecto, exactas).')
+    parser.add_argument('--chunksize', type=int, default=500_000, help='Filas por bloque.')
+    parser.add_argument('--jobs', type=int, default=1, help='Procesos para reducir los bloques.')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        chunks = iter_file(args.archivo, args.chunksize, columns=['Target', args.puntuacion])
+        curve = evaluate_chunks(chunks, score=args.puntuacion, n_jobs=args.jobs, decimals=args.decimales)
+        metrics = curve.metrics(0.5)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}.")
+        sys.exit(1)
+    except (KeyError, ValueError) as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    rows = curve.n_positives + curve.n_negatives
+    print(f"{rows:,} filas ({curve.n_positives:,} churn), {curve.scores.size:,} probabilidades distintas, "
+          f"evaluadas en {elapsed:.2f}s")
+    print(f"  ROC AUC: {metrics['ROC AUC']:.4f}")
+    print(f"  PR AUC: {metrics['PR AUC']:.4f}")
+
+    best = curve.best_threshold('F1 Score')
+    print("\nPuntos de operación (positivo si probabilidad > umbral):")
+    columns = ['Umbral', 'TP', 'FP', 'FN', 'TN', 'Precision', 'Recall', 'F1 Score', 'Accuracy']
+    print(curve.at(args.umbrales)[columns].to_string(index=False, float_format=lambda value: f'{value:.4f}'))
+    print(f"\nMejor umbral por F1: {best['Umbral']:.4f} (F1 {best['F1 Score']:.4f}, "
+          f"precision {best['Precision']:.4f}, recall {best['Recall']:.4f})")
+
+    if args.curva:
+        full = curve.curve()
+        full.to_csv(args.curva, index=False)
+        print(f"Curva completa ({len(full):,} umbrales) guardada en {args.curva}")
+
+
+if __name__ == '__main__':
+    main()
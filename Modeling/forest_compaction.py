@@ -0,0 +1,173 @@
+"""Random Forest compaction: trade model size for latency within an AUC budget.
+
+The production forest (CHURN_MODEL_PARAMS) grows 100 unpruned trees. This
+script searches over the number of trees, max_depth and min_samples_leaf
+on the holdout split of modeling_pipeline.py and reports, for each
+setting, the size of the pickled pipeline, its load time, the scoring
+latency of one row and of the whole test set, and the ROC-AUC. The
+smallest setting whose AUC is within ``--tolerancia`` of the full model
+is refit on the whole dataset and registered as ``random_forest_compacto``,
+so batch_scoring.py and scoring_service.py can use it with ``--modelo``.
+
+    python Modeling/forest_compaction.py
+    python Modeling/forest_compaction.py --tolerancia 0.005 --arboles 10 25 50 --profundidad 8 12 0
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset
+from model_registry import (CHURN_MODEL_PARAMS, CHURN_MODEL_VERSION, data_hash, fit_churn_model, load_or_train,
+                            update_metadata)
+from preprocessing import fit_transform
+from benchmark_inference import best_time
+
+COMPACT_MODEL = 'random_forest_compacto'
+
+# Searched values; max_depth None grows unpruned trees
+COMPACTION_GRID = {
+    'n_estimators': [10, 25, 50, 100],
+    'max_depth': [6, 10, 16, None],
+    'min_samples_leaf': [1, 5, 20],
+}
+
+
+def measure_setting(params, preprocessor, X_train_t, y_train, X_test, y_test, repeat=5):
+    """Size, load time, latency and ROC-AUC of a forest trained with ``params``."""
+    start = time.perf_counter()
+    classifier = RandomForestClassifier(**params).fit(X_train_t, y_train)
+    fit_time = time.perf_counter() - start
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.joblib')
+        joblib.dump(pipeline, path)
+        size = os.path.getsize(path)
+        load_time = best_time(lambda: joblib.load(path), repeat)
+    row = X_test.iloc[:1]
+    return {
+        **params,
+        'Nodos': sum(tree.tree_.node_count for tree in classifier.estimators_),
+        'Tamaño (MB)': size / 1e6,
+        'Carga (ms)': load_time * 1000,
+        'Latencia 1 fila (ms)': best_time(lambda: pipeline.predict_proba(row), repeat) * 1000,
+        'Puntuación test (ms)': best_time(lambda: pipeline.predict_proba(X_test), repeat) * 1000,
+        'Entrenamiento (s)': fit_time,
+        'ROC AUC': roc_auc_score(y_test, pipeline.predict_proba(X_test)[:, 1]),
+    }
+
+
+def compaction_report(X, y, grid=COMPACTION_GRID, test_size=0.2, random_state=42, progress=None):
+    """One row of measurements per setting of ``grid``, plus the full model.
+
+    The full model (CHURN_MODEL_PARAMS) is the first row and is marked in
+    the ``Referencia`` column. ``progress`` is called with each row.
+    """
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y)
+    preprocessor, X_train_t, _ = fit_transform(X_train, X_test)
+    # The reference spelled out with scikit-learn's defaults for the grid
+    defaults = RandomForestClassifier().get_params()
+    settings = [{**CHURN_MODEL_PARAMS, **{name: defaults[name] for name in grid}}]
+    for values in itertools.product(*grid.values()):
+        params = {**CHURN_MODEL_PARAMS, **dict(zip(grid, values))}
+        if params not in settings:
+            settings.append(params)
+    rows = []
+    for i, params in enumerate(settings):
+        row = {**measure_setting(params, preprocessor, X_train_t, y_train, X_test, y_test),
+               'Referencia': i == 0}
+        rows.append(row)
+        if progress is not None:
+            progress(row)
+    return pd.DataFrame(rows)
+
+
+def select_compact(report, tolerance=0.01):
+    """Row of the smallest setting whose AUC is within ``tolerance`` of the reference."""
+    reference_auc = report.loc[report['Referencia'], 'ROC AUC'].iloc[0]
+    eligible = report[report['ROC AUC'] >= reference_auc - tolerance]
+    return eligible.sort_values(['Tamaño (MB)', 'Latencia 1 fila (ms)']).iloc[0]
+
+
+def _settings_params(row):
+    # Plain ints (None for no depth limit) so the registry key is stable
+    return {name: None if pd.isna(row[name]) else int(row[name])
+            for name in {**CHURN_MODEL_PARAMS, **COMPACTION_GRID}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Busca el Random Forest más pequeño dentro de una tolerancia de AUC.')
+    parser.add_argument('--tolerancia', type=float, default=0.01,
+                        help='Pérdida máxima de ROC AUC respecto al modelo completo (por defecto 0.01).')
+    parser.add_argument('--arboles', type=int, nargs='+', default=COMPACTION_GRID['n_estimators'],
+                        help='Números de árboles a probar.')
+    parser.add_argument('--profundidad', type=int, nargs='+', default=[6, 10, 16, 0],
+                        help='Profundidades máximas a probar (0 = sin límite).')
+    parser.add_argument('--hoja', type=int, nargs='+', default=COMPACTION_GRID['min_samples_leaf'],
+                        help='Valores de min_samples_leaf a probar.')
+    parser.add_argument('--no-registrar', action='store_true',
+                        help='Solo mostrar el informe, sin registrar el modelo compacto.')
+    args = parser.parse_args(argv)
+
+    try:
+        df = load_dataset('limpio')
+    except FileNotFoundError:
+        print("Error: no se encontró el dataset limpio. Ejecuta primero EDA/eda_script.py.")
+        sys.exit(1)
+    X = df.drop('Target', axis=1)
+    y = df['Target']
+    grid = {'n_estimators': args.arboles,
+            'max_depth': [depth or None for depth in args.profundidad],
+            'min_samples_leaf': args.hoja}
+
+    def progress(row):
+        depth = row['max_depth'] or '-'
+        print(f"  árboles={row['n_estimators']:>3} profundidad={depth!s:>2} hoja={row['min_samples_leaf']:>2}: "
+              f"{row['Tamaño (MB)']:7.2f} MB, AUC {row['ROC AUC']:.4f}")
+
+    n_settings = len(list(itertools.product(*grid.values())))
+    print(f"--- Compactación del Random Forest ({n_settings} configuraciones) ---")
+    report = compaction_report(X, y, grid, progress=progress)
+    chosen = select_compact(report, args.tolerancia)
+    reference = report[report['Referencia']].iloc[0]
+
+    columns = ['n_estimators', 'max_depth', 'min_samples_leaf', 'Nodos', 'Tamaño (MB)', 'Carga (ms)',
+               'Latencia 1 fila (ms)', 'Puntuación test (ms)', 'ROC AUC']
+    print("\nConfiguraciones dentro de la tolerancia, de menor a mayor tamaño:")
+    eligible = report[report['ROC AUC'] >= reference['ROC AUC'] - args.tolerancia].sort_values('Tamaño (MB)')
+    eligible = eligible.assign(max_depth=eligible['max_depth'].map(lambda depth: '-' if pd.isna(depth) else int(depth)))
+    print(eligible[columns].to_string(index=False, float_format=lambda v: f'{v:,.3f}'))
+    print(f"\nModelo completo: {reference['Tamaño (MB)']:.2f} MB, carga {reference['Carga (ms)']:.0f} ms, "
+          f"AUC {reference['ROC AUC']:.4f}")
+    print(f"Modelo compacto: {chosen['Tamaño (MB)']:.2f} MB "
+          f"({reference['Tamaño (MB)'] / chosen['Tamaño (MB)']:.1f}x menor), "
+          f"carga {chosen['Carga (ms)']:.0f} ms, AUC {chosen['ROC AUC']:.4f}")
+
+    if args.no_registrar:
+        return
+    params = _settings_params(chosen)
+    _, metadata, loaded = load_or_train(COMPACT_MODEL, lambda: fit_churn_model(X, y, params),
+                                        data_hash(df), params, CHURN_MODEL_VERSION)
+    # Holdout AUCs and the full search, for whoever picks this model later
+    metadata = update_metadata(
+        COMPACT_MODEL, metadata['key'],
+        metrics={'ROC AUC': float(chosen['ROC AUC']), 'ROC AUC referencia': float(reference['ROC AUC']),
+                 'Tolerancia': args.tolerancia},
+        compaction=report.astype(object).where(report.notna(), None).to_dict('records'))
+    action = 'ya estaba registrado' if loaded else 'registrado'
+    print(f"Modelo compacto {action} como '{COMPACT_MODEL}' (clave {metadata['key'][:12]}, parámetros {params})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Warm-start refresh of the registered Random Forest with a new data window.
+
+Instead of rebuilding all trees, the last registered forest is loaded and
+``--arboles-nuevos`` trees are grown on the newest window only
+(``warm_start``), so the cost of a refresh tracks the size of the new
+data. With ``--max-arboles`` the oldest trees are dropped afterwards: the
+ensemble keeps a fixed size and a sliding window over the weekly data.
+The preprocessor of the base model is kept, so every tree sees the same
+transformed columns (categories it never saw are ignored).
+
+A share of the new window (``--evaluacion``) is held out. Each refresh
+reports the base model, the refreshed one and, unless ``--sin-comparar``,
+a full retrain on the cleaned dataset plus the new window, all on that
+holdout. The refreshed forest is registered as the latest
+``random_forest``, so batch scoring and the scoring service pick it up.
+
+    python Modeling/forest_refresh.py clientes_semana.parquet
+    python Modeling/forest_refresh.py clientes_semana.parquet --arboles-nuevos 20 --max-arboles 100
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import apply_schema, load_dataset, read_file
+from model_comparison import score
+from model_registry import (CHURN_MODEL, CHURN_MODEL_PARAMS, CHURN_MODEL_VERSION, data_hash, fit_churn_model,
+                            load_model, save_model)
+from preprocessing import feature_names
+
+
+def refresh_forest(pipeline, X_new, y_new, n_new_trees, max_trees=None):
+    """Copy of ``pipeline`` with ``n_new_trees`` grown on (``X_new``, ``y_new``).
+
+    The oldest trees are dropped so at most ``max_trees`` remain. Returns
+    (refreshed pipeline, seconds spent growing the new trees).
+    """
+    pipeline = copy.deepcopy(pipeline)
+    forest = pipeline.named_steps['classifier']
+    X_t = pipeline.named_steps['preprocessor'].transform(X_new)
+    missing = set(forest.classes_) - set(pd.unique(y_new))
+    if missing:
+        raise ValueError(f"La ventana nueva no tiene ejemplos de la clase {sorted(missing)}.")
+    start = time.perf_counter()
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_new_trees)
+    forest.fit(X_t, y_new)
+    fit_time = time.perf_counter() - start
+    forest.set_params(warm_start=False)
+    if max_trees is not None and len(forest.estimators_) > max_trees:
+        # estimators_ are in training order: the oldest come first
+        forest.estimators_ = forest.estimators_[-max_trees:]
+        forest.set_params(n_estimators=max_trees)
+    return pipeline, fit_time
+
+
+def _evaluate(pipeline, X, y):
+    return score(y, pipeline.predict_proba(X)[:, 1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Refresca el Random Forest registrado con árboles entrenados en datos nuevos.')
+    parser.add_argument('nuevos', help='CSV o Parquet con los clientes nuevos (columnas del dataset limpio y Target).')
+    parser.add_argument('--arboles-nuevos', type=int, default=20, help='Árboles a entrenar con la ventana nueva.')
+    parser.add_argument('--max-arboles', type=int, default=CHURN_MODEL_PARAMS['n_estimators'],
+                        help='Tamaño máximo del bosque; se descartan los árboles más antiguos (0 = sin límite).')
+    parser.add_argument('--evaluacion', type=float, default=0.2,
+                        help='Fracción de la ventana nueva reservada para comparar los modelos.')
+    parser.add_argument('--clave', default=None, help='Clave del modelo base (por defecto, el último).')
+    parser.add_argument('--sin-comparar', action='store_true', help='No entrenar el modelo completo de referencia.')
+    parser.add_argument('--no-registrar', action='store_true', help='No guardar el bosque refrescado.')
+    args = parser.parse_args(argv)
+
+    try:
+        base, base_metadata = load_model(CHURN_MODEL, key=args.clave)
+        new = read_file(args.nuevos)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. "
+              "Ejecuta primero Modeling/modeling_pipeline.py o revisa la ruta de los datos nuevos.")
+        sys.exit(1)
+    features = list(base.feature_names_in_)
+    X_new, X_eval, y_new, y_eval = train_test_split(
+        new[features], new['Target'], test_size=args.evaluacion, random_state=42, stratify=new['Target'])
+
+    max_trees = args.max_arboles or None
+    try:
+        refreshed, refresh_time = refresh_forest(base, X_new, y_new, args.arboles_nuevos, max_trees)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    forest = refreshed.named_steps['classifier']
+    print(f"Modelo base: clave {base_metadata['key'][:12]}, {len(base.named_steps['classifier'].estimators_)} árboles")
+    print(f"Ventana nueva: {len(X_new):,} filas de entrenamiento, {len(X_eval):,} de evaluación")
+    print(f"Refresco: {args.arboles_nuevos} árboles nuevos en {refresh_time:.2f}s; "
+          f"el bosque queda con {len(forest.estimators_)} árboles")
+
+    rows = {'Base': {**_evaluate(base, X_eval, y_eval), 'Tiempo (s)': None},
+            'Refrescado': {**_evaluate(refreshed, X_eval, y_eval), 'Tiempo (s)': refresh_time}}
+    if not args.sin_comparar:
+        history = load_dataset('limpio')
+        window = pd.concat([history, apply_schema(X_new.assign(Target=y_new))], ignore_index=True)
+        window = apply_schema(window)
+        start = time.perf_counter()
+        full, _ = fit_churn_model(window[features], window['Target'])
+        full_time = time.perf_counter() - start
+        rows['Reentrenamiento completo'] = {**_evaluate(full, X_eval, y_eval), 'Tiempo (s)': full_time}
+    print("\nEvaluación en la ventana nueva reservada:")
+    print(pd.DataFrame(rows).T.to_string(float_format=lambda value: f'{value:.4f}'))
+
+    if args.no_registrar:
+        return
+    # The key covers the base artifact, the window and the refresh settings
+    params = {**CHURN_MODEL_PARAMS, 'refresh_of': base_metadata['key'],
+              'new_trees': args.arboles_nuevos, 'max_trees': max_trees}
+    importances = dict(zip(feature_names(refreshed.named_steps['preprocessor']),
+                           forest.feature_importances_.tolist()))
+    metadata = save_model(CHURN_MODEL, refreshed, data_hash(X_new.assign(Target=y_new)), params,
+                          CHURN_MODEL_VERSION, metrics=rows['Refrescado'], training_time=refresh_time,
+                          feature_importances=importances)
+    print(f"\nBosque refrescado registrado como último '{CHURN_MODEL}' (clave {metadata['key'][:12]})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Cross-validated, multi-process model comparison for modeling_pipeline.py.
+
+Every (model, fold) pair is an independent job. The preprocessing of each
+fold is fitted once in the parent process (through the shared cache in
+preprocessing.py) and dumped to a temporary directory; the workers open
+those matrices memory-mapped, so the data is not copied into every job.
+Native models (e.g. histogram gradient boosting with categorical dtypes)
+get the raw fold frames instead.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import ScoreCurve
+from preprocessing import fit_transform
+
+METRICS = ['Accuracy', 'Precision', 'Recall', 'F1 Score', 'ROC AUC', 'PR AUC']
+
+
+def score(y_true, y_pred_proba, threshold=0.5):
+    """The comparison metrics of one set of probabilities, cut at ``threshold``."""
+    return ScoreCurve.from_scores(y_true, y_pred_proba).metrics(threshold)
+
+
+def fit_measured(model, X, y, trace_memory=False):
+    """Fit ``model`` once; returns (seconds, peak memory in MB or None).
+
+    The peak is only measured with ``trace_memory``, and then the time
+    includes the tracing overhead (tracemalloc slows every allocation
+    down, ~3x for the Random Forest). It is what tracemalloc sees: Python
+    objects and NumPy arrays, not buffers that compiled code allocates
+    with plain malloc (e.g. the node arrays of scikit-learn trees); see
+    ``model_size`` for the size of the fitted model.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        model.fit(X, y)
+        fit_time = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return fit_time, peak
+
+
+def model_size(model):
+    """Size of the pickled fitted ``model`` in MB, tree buffers included."""
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+
+
+def dump_fold(directory, fold, X_train, X_test, y_train, y_test):
+    """Write one split as dense arrays that workers can open memory-mapped."""
+    path = os.path.join(directory, f'fold_{fold}.joblib')
+    arrays = {'X_train': X_train, 'X_test': X_test,
+              'y_train': np.asarray(y_train), 'y_test': np.asarray(y_test)}
+    # Memory mapping needs dense arrays
+    arrays = {key: value.toarray() if sparse.issparse(value) else np.asarray(value)
+              for key, value in arrays.items()}
+    joblib.dump(arrays, path)
+    return path
+
+
+def _fit_fold(model, path, raw_path=None, trace_memory=False):
+    data = joblib.load(path, mmap_mode='r')
+    if raw_path is not None:
+        X_train, X_test = joblib.load(raw_path)
+    else:
+        X_train, X_test = data['X_train'], data['X_test']
+    fit_time, memory = fit_measured(model, X_train, data['y_train'], trace_memory)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    costs = {'Tiempo (s)': fit_time, 'Tamaño (MB)': model_size(model)}
+    if trace_memory:
+        costs['Memoria (MB)'] = memory
+    return {**score(data['y_test'], y_pred_proba), **costs}
+
+
+def cross_validate_models(models, X, y, n_splits=5, n_jobs=1, random_state=42, native_models=None,
+                          trace_memory=False):
+    """Stratified k-fold comparison of ``models`` ({name: estimator}).
+
+    ``native_models`` are fitted on the raw fold frames instead of the
+    preprocessed matrices. The ``n_models * n_splits`` fits run in
+    ``n_jobs`` processes; ``trace_memory`` adds their peak memory (see
+    ``fit_measured``). Returns (per-fold scores, summary with the mean
+    and std of each metric per model).
+    """
+    native_models = native_models or {}
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X, y)
+    with tempfile.TemporaryDirectory(prefix='cv_') as directory:
+        paths, raw_paths = [], []
+        for fold, (train_idx, test_idx) in enumerate(folds):
+            _, X_train, X_test = fit_transform(X.iloc[train_idx], X.iloc[test_idx])
+            paths.append(dump_fold(directory, fold, X_train, X_test,
+                                    y.iloc[train_idx], y.iloc[test_idx]))
+            if native_models:
+                raw_paths.append(os.path.join(directory, f'fold_{fold}_raw.joblib'))
+                joblib.dump((X.iloc[train_idx], X.iloc[test_idx]), raw_paths[-1])
+
+        all_models = {**models, **native_models}
+        jobs = [(name, fold) for name in all_models for fold in range(len(paths))]
+        args = [(clone(all_models[name]), paths[fold], raw_paths[fold] if name in native_models else None,
+                 trace_memory) for name, fold in jobs]
+        if n_jobs <= 1:
+            scores = [_fit_fold(*job_args) for job_args in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                futures = [pool.submit(_fit_fold, *job_args) for job_args in args]
+                scores = [future.result() for future in futures]
+
+    per_fold = pd.DataFrame(scores, index=pd.MultiIndex.from_tuples(jobs, names=['Modelo', 'Fold']))
+    summary = per_fold.groupby(level='Modelo', sort=False).agg(['mean', 'std'])
+    return per_fold, summary
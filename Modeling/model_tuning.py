@@ -0,0 +1,293 @@
+"""Budgeted hyperparameter search with successive halving.
+
+Random configurations of every candidate model (SEARCH_SPACES), plus the
+production Random Forest (DEFAULT_CANDIDATE), start on a small share of
+the training rows and, for the ensembles, a small number of trees or
+boosting iterations. After each rung only the best ``1 / factor``
+configurations by validation ROC AUC move on to the next rung, which
+multiplies rows and trees by ``factor``; the last rung compares the
+remaining configurations on all the training rows with the full tree
+budget. Weak configurations therefore cost a fraction of a full fit.
+
+The fits of a rung run in a process pool over memory-mapped matrices (as
+in model_comparison.py). ``--presupuesto`` bounds the wall-clock time:
+each rung's rows and trees are capped so that its time, projected from
+the previous rung, fits in what remains, and when it runs out no new fits
+are started and the best configuration of the last rung with results
+wins. The winner is refit on the full training split and evaluated on the
+holdout of modeling_pipeline.py; it is registered as ``modelo_ajustado``,
+with the per-rung time report in its metadata, only if its ROC AUC is not
+below that of the production recipe on the same split.
+
+    python Modeling/model_tuning.py
+    python Modeling/model_tuning.py --configuraciones 81 --presupuesto 300 --jobs 4
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import loguniform
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset
+from model_comparison import dump_fold, score
+from model_registry import CHURN_MODEL_PARAMS, CHURN_MODEL_VERSION, data_hash, fit_churn_model, save_model, update_metadata
+from preprocessing import fit_transform, raw_split
+
+TUNED_MODEL = 'modelo_ajustado'
+
+# name: (base estimator, sampled parameters, budget parameter or None,
+# fitted on raw frames). The budget parameter (trees or iterations) grows
+# with the rung like the number of rows.
+SEARCH_SPACES = {
+    'Regresión Logística': (
+        LogisticRegression(max_iter=1000, random_state=42),
+        {'C': loguniform(1e-3, 1e2)}, None, False),
+    'Árbol de Decisión': (
+        DecisionTreeClassifier(random_state=42),
+        {'max_depth': [4, 6, 8, 12, 16, None], 'min_samples_leaf': [1, 2, 5, 10, 20],
+         'criterion': ['gini', 'entropy']}, None, False),
+    'Random Forest': (
+        RandomForestClassifier(random_state=42),
+        {'max_depth': [8, 12, 16, None], 'min_samples_leaf': [1, 2, 5],
+         'max_features': ['sqrt', 0.5, None]}, 'n_estimators', False),
+    'Gradient Boosting': (
+        HistGradientBoostingClassifier(categorical_features='from_dtype', early_stopping=False, random_state=42),
+        {'learning_rate': loguniform(0.02, 0.3), 'max_leaf_nodes': [15, 31, 63],
+         'min_samples_leaf': [5, 20, 50], 'l2_regularization': [0.0, 0.1, 1.0]}, 'max_iter', True),
+}
+
+
+# The production Random Forest (CHURN_MODEL_PARAMS without the tree count,
+# which is the rung budget), always among the candidates
+DEFAULT_CANDIDATE = ('Random Forest', {key: value for key, value in CHURN_MODEL_PARAMS.items()
+                                       if key != 'n_estimators'})
+
+
+def sample_candidates(n_candidates, spaces=SEARCH_SPACES, random_state=42):
+    """``n_candidates`` (model name, parameters) pairs, spread evenly over ``spaces``."""
+    names = list(spaces)
+    per_model = [n_candidates // len(names) + (i < n_candidates % len(names)) for i in range(len(names))]
+    candidates = []
+    for name, count in zip(names, per_model):
+        sampler = ParameterSampler(spaces[name][1], n_iter=count, random_state=random_state)
+        candidates += [(name, {key: value.item() if isinstance(value, np.generic) else value
+                               for key, value in params.items()}) for params in sampler]
+    return candidates
+
+
+def build_estimator(name, params, budget=None, spaces=SEARCH_SPACES):
+    """Unfitted estimator of ``name`` with ``params`` and the rung's tree budget."""
+    base, _, budget_param, _ = spaces[name]
+    estimator = clone(base).set_params(**params)
+    if budget_param is not None and budget is not None:
+        estimator.set_params(**{budget_param: budget})
+    return estimator
+
+
+def _fit_candidate(estimator, path, raw_path, n_rows):
+    data = joblib.load(path, mmap_mode='r')
+    if raw_path is not None:
+        X_fit, X_val = joblib.load(raw_path)
+        X_fit = X_fit.iloc[:n_rows]
+    else:
+        X_fit, X_val = data['X_train'][:n_rows], data['X_test']
+    start = time.perf_counter()
+    estimator.fit(X_fit, data['y_train'][:n_rows])
+    fit_time = time.perf_counter() - start
+    return roc_auc_score(data['y_test'], estimator.predict_proba(X_val)[:, 1]), fit_time
+
+
+def successive_halving(candidates, X_train, y_train, factor=3, max_budget=200, budget_seconds=None,
+                       n_jobs=1, spaces=SEARCH_SPACES, random_state=42, progress=None):
+    """Run successive halving over ``candidates`` on a train/validation split of ``X_train``.
+
+    Returns (results, rungs): one row per evaluated (rung, candidate) with
+    its validation ROC AUC and fit time, and one row per rung with its
+    resources, wall time and best score. ``progress`` is called with each
+    rung row.
+    """
+    X_fit, X_val, y_fit, y_val = raw_split(X_train, y_train, test_size=0.25, random_state=random_state)
+    _, X_fit_t, X_val_t = fit_transform(X_fit, X_val)
+    # Enough rungs for the last one, at all the rows and the full budget, to
+    # still compare ceil(n / factor ** (n_rungs - 1)) > 1 configurations
+    n_rungs = max(1, math.ceil(math.log(len(candidates), factor) - 1e-9))
+    deadline = time.perf_counter() + budget_seconds if budget_seconds else None
+
+    results, rungs = [], []
+    survivors = list(range(len(candidates)))
+    with tempfile.TemporaryDirectory(prefix='tuning_') as directory, \
+            ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        path = dump_fold(directory, 0, X_fit_t, X_val_t, y_fit, y_val)
+        raw_path = os.path.join(directory, 'raw.joblib')
+        joblib.dump((X_fit, X_val), raw_path)
+
+        for rung in range(n_rungs):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            fraction = float(factor) ** (rung - n_rungs + 1)
+            if deadline is not None and rungs:
+                # Project this rung from the last one: the cost of a fit grows
+                # with rows x trees, both proportional to the fraction. If it
+                # does not fit in the remaining budget, shrink the fraction
+                remaining = deadline - time.perf_counter()
+                last = rungs[-1]
+                projected = (last['Tiempo (s)'] * len(survivors) / last['Configuraciones']
+                             * (fraction / last_fraction) ** 2)
+                if projected > remaining:
+                    fraction *= math.sqrt(remaining / projected)
+                    if fraction <= last_fraction:
+                        break
+            last_fraction = fraction
+            n_rows = max(50, int(round(fraction * len(X_fit))))
+            budget = max(5, int(round(fraction * max_budget)))
+            start = time.perf_counter()
+            futures = {}
+            for i in survivors:
+                name, params = candidates[i]
+                estimator = build_estimator(name, params, budget, spaces)
+                futures[pool.submit(_fit_candidate, estimator, path,
+                                    raw_path if spaces[name][3] else None, n_rows)] = i
+            scores = {}
+            pending = set(futures)
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scores[futures[future]] = future.result()
+                if not done:
+                    # Out of time: drop the fits that have not started
+                    for future in pending:
+                        future.cancel()
+                    break
+            for i, (auc, fit_time) in scores.items():
+                name, params = candidates[i]
+                results.append({'Ronda': rung, 'Candidato': i, 'Modelo': name, 'Parámetros': params,
+                                'Filas': n_rows, 'Presupuesto': budget if spaces[name][2] else None,
+                                'ROC AUC': auc, 'Tiempo (s)': fit_time})
+            if not scores:
+                break
+            ranked = sorted(scores, key=lambda i: scores[i][0], reverse=True)
+            complete = len(scores) == len(survivors)
+            survivors = ranked[:max(1, math.ceil(len(survivors) / factor))] if complete else ranked[:1]
+            rungs.append({'Ronda': rung, 'Configuraciones': len(futures), 'Evaluadas': len(scores),
+                          'Filas': n_rows, 'Árboles/iteraciones': budget,
+                          'Tiempo (s)': time.perf_counter() - start,
+                          'Mejor ROC AUC': scores[ranked[0]][0], 'Mejor modelo': candidates[ranked[0]][0]})
+            if progress is not None:
+                progress(rungs[-1])
+            if not complete:
+                break
+    return pd.DataFrame(results), pd.DataFrame(rungs)
+
+
+def best_candidate(results):
+    """Row of the best configuration of the last rung with results."""
+    last = results[results['Ronda'] == results['Ronda'].max()]
+    return last.loc[last['ROC AUC'].idxmax()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ajuste de hiperparámetros por successive halving con presupuesto de tiempo.')
+    parser.add_argument('--configuraciones', type=int, default=27,
+                        help='Configuraciones iniciales, repartidas entre los modelos (por defecto 27).')
+    parser.add_argument('--factor', type=int, default=3,
+                        help='Factor de reducción por ronda (y de aumento de filas y árboles).')
+    parser.add_argument('--max-arboles', type=int, default=200,
+                        help='Árboles (Random Forest) o iteraciones (Gradient Boosting) de la última ronda.')
+    parser.add_argument('--presupuesto', type=float, default=120,
+                        help='Tiempo máximo de la búsqueda en segundos (0 = sin límite).')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Procesos en paralelo.')
+    parser.add_argument('--no-registrar', action='store_true', help='No guardar el modelo ganador.')
+    args = parser.parse_args(argv)
+
+    try:
+        df = load_dataset('limpio')
+    except FileNotFoundError:
+        print("Error: no se encontró el dataset limpio. Ejecuta primero EDA/eda_script.py.")
+        sys.exit(1)
+    X = df.drop('Target', axis=1)
+    y = df['Target']
+    # Same holdout as modeling_pipeline.py; the search only sees the train split
+    X_train, X_test, y_train, y_test = raw_split(X, y, test_size=0.2, random_state=42)
+
+    candidates = [DEFAULT_CANDIDATE] + sample_candidates(args.configuraciones - 1)
+
+    def progress(rung):
+        print(f"  Ronda {rung['Ronda']}: {rung['Evaluadas']}/{rung['Configuraciones']} configuraciones, "
+              f"{rung['Filas']:,} filas, {rung['Árboles/iteraciones']} árboles/iteraciones, "
+              f"{rung['Tiempo (s)']:.1f}s; mejor AUC {rung['Mejor ROC AUC']:.4f} ({rung['Mejor modelo']})")
+
+    print(f"--- Successive halving: {len(candidates)} configuraciones, factor {args.factor}, "
+          f"{args.jobs} procesos, presupuesto {args.presupuesto or 'sin límite'}s ---")
+    start = time.perf_counter()
+    results, rungs = successive_halving(candidates, X_train, y_train, factor=args.factor,
+                                        max_budget=args.max_arboles, budget_seconds=args.presupuesto or None,
+                                        n_jobs=args.jobs, progress=progress)
+    search_time = time.perf_counter() - start
+    if results.empty:
+        print("Error: el presupuesto se agotó antes de evaluar ninguna configuración.")
+        sys.exit(1)
+
+    best = best_candidate(results)
+    name, params = best['Modelo'], best['Parámetros']
+    print(f"\nBúsqueda: {search_time:.1f}s. Ganador: {name} {params}")
+    print("\nMejor configuración por modelo (última ronda alcanzada):")
+    reached = results[results.groupby('Modelo')['Ronda'].transform('max') == results['Ronda']]
+    summary = reached.loc[reached.groupby('Modelo')['ROC AUC'].idxmax(), ['Modelo', 'Ronda', 'ROC AUC']]
+    summary = summary.sort_values(['Ronda', 'ROC AUC'], ascending=False)
+    print(summary.to_string(index=False, float_format=lambda value: f'{value:.4f}'))
+
+    # Refit the winner on the whole train split with the full budget
+    estimator = build_estimator(name, params, args.max_arboles)
+    start = time.perf_counter()
+    if SEARCH_SPACES[name][3]:
+        pipeline = Pipeline(steps=[('classifier', estimator.fit(X_train, y_train))])
+    else:
+        preprocessor, X_train_t, _ = fit_transform(X_train)
+        pipeline = Pipeline(steps=[('preprocessor', preprocessor),
+                                   ('classifier', estimator.fit(X_train_t, y_train))])
+    training_time = time.perf_counter() - start
+    metrics = score(y_test, pipeline.predict_proba(X_test)[:, 1])
+    print(f"\nGanador reentrenado en {training_time:.2f}s; holdout:")
+    for metric, value in metrics.items():
+        print(f"  {metric}: {value:.4f}")
+
+    # The production recipe on the same split: a tuned model that does not
+    # beat it on the holdout is not worth registering
+    default, _ = fit_churn_model(X_train, y_train)
+    default_metrics = score(y_test, default.predict_proba(X_test)[:, 1])
+    print(f"Random Forest de producción (CHURN_MODEL_PARAMS): ROC AUC {default_metrics['ROC AUC']:.4f}")
+
+    if args.no_registrar:
+        return
+    if metrics['ROC AUC'] < default_metrics['ROC AUC']:
+        print(f"El ganador no mejora el ROC AUC del modelo de producción; no se registra '{TUNED_MODEL}'.")
+        return
+    recipe = {'model': name, **params}
+    if SEARCH_SPACES[name][2] is not None:
+        recipe[SEARCH_SPACES[name][2]] = args.max_arboles
+    metadata = save_model(TUNED_MODEL, pipeline, data_hash(df), recipe, CHURN_MODEL_VERSION,
+                          metrics=metrics, training_time=training_time)
+    metadata = update_metadata(TUNED_MODEL, metadata['key'], search_time=search_time,
+                               rungs=rungs.to_dict('records'),
+                               candidates=results.astype({'Parámetros': str}).to_dict('records'))
+    print(f"Modelo ganador registrado como '{TUNED_MODEL}' (clave {metadata['key'][:12]})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,36 @@
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
+import os
+import sys
+import time
 from sklearn.linear_model import LogisticRegression
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix, roc_curve
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset
+from evaluation import ScoreCurve
+from importance import cached_importance
+from preprocessing import feature_columns, preprocessed_split, raw_split
+from model_comparison import METRICS, cross_validate_models, fit_measured, model_size
+from model_registry import CHURN_MODEL, CHURN_MODEL_PARAMS, load_churn_model, update_metadata
+
+parser = argparse.ArgumentParser(description='Entrenamiento y evaluación de modelos de churn.')
+parser.add_argument('--cv', type=int, default=None,
+                    help='Comparar los modelos con validación cruzada de N folds (media y desviación).')
+parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                    help='Procesos para los trabajos (modelo x fold) de la validación cruzada.')
+parser.add_argument('--memoria', action='store_true',
+                    help='Medir la memoria pico de entrenamiento con tracemalloc (los ajustes tardan más).')
+args = parser.parse_args()
 
 # Load data
 try:
-    df = pd.read_csv('datos/dataset_ecommerce_limpio_es.csv')
+    df = load_dataset('limpio')
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("Error: File not found. Please run EDA first.")
@@ -24,69 +41,86 @@ X = df.drop('Target', axis=1)
 y = df['Target']
 
 # Identify categorical and numerical columns
-categorical_cols = X.select_dtypes(include=['object']).columns.tolist()
-numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+numerical_cols, categorical_cols = feature_columns(X)
 
 print(f"Columnas categóricas: {categorical_cols}")
 print(f"Columnas numéricas: {numerical_cols}")
 
-# Create preprocessor
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', StandardScaler(), numerical_cols),
-        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_cols)
-    ])
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
 # Define models
 models = {
     'Regresión Logística': LogisticRegression(max_iter=1000, random_state=42),
     'Árbol de Decisión': DecisionTreeClassifier(random_state=42),
-    'Random Forest': RandomForestClassifier(random_state=42)
+    'Random Forest': RandomForestClassifier(**CHURN_MODEL_PARAMS)
+}
+
+# Models fitted on the raw columns instead of the shared matrices: histogram
+# gradient boosting bins the numeric columns itself, splits natively on the
+# categorical dtype (no one-hot expansion) and stops early on a validation split
+native_models = {
+    'Gradient Boosting': HistGradientBoostingClassifier(
+        categorical_features='from_dtype', max_iter=500, early_stopping=True,
+        validation_fraction=0.1, n_iter_no_change=20, random_state=42)
 }
 
+# Comparison mode: every (model, fold) fit is a job in a process pool
+if args.cv:
+    print(f"\n--- Validación Cruzada ({args.cv} folds, {args.jobs} procesos) ---")
+    start = time.perf_counter()
+    per_fold, summary = cross_validate_models(models, X, y, n_splits=args.cv, n_jobs=args.jobs,
+                                              native_models=native_models, trace_memory=args.memoria)
+    for name, row in summary.iterrows():
+        print(f"\n{name}:")
+        for metric in per_fold.columns:
+            print(f"  {metric}: {row[(metric, 'mean')]:.4f} ± {row[(metric, 'std')]:.4f}")
+    print(f"\nTiempo total: {time.perf_counter() - start:.2f}s")
+    sys.exit()
+
+# Split data and fit the preprocessing once (cached on disk); every model
+# below is trained on the same transformed matrices
+start = time.perf_counter()
+preprocessor, X_train, X_test, y_train, y_test = preprocessed_split(X, y, test_size=0.2, random_state=42)
+print(f"Preprocesamiento: {time.perf_counter() - start:.2f}s")
+# Same rows, raw columns, for the native models
+X_train_raw, X_test_raw, _, _ = raw_split(X, y, test_size=0.2, random_state=42)
+
 # Train and Evaluate
 results = {}
+costs = {}
+curves = {}
+candidates = [(name, model, X_train, X_test) for name, model in models.items()]
+candidates += [(name, model, X_train_raw, X_test_raw) for name, model in native_models.items()]
 
 print("\n--- Evaluación de Modelos ---")
-for name, model in models.items():
-    # Create pipeline
-    clf = Pipeline(steps=[('preprocessor', preprocessor),
-                          ('classifier', model)])
-    
+for name, model, X_fit, X_eval in candidates:
     # Train
-    clf.fit(X_train, y_train)
+    fit_time, fit_memory = fit_measured(model, X_fit, y_train, trace_memory=args.memoria)
     
     # Predict
-    y_pred = clf.predict(X_test)
-    y_pred_proba = clf.predict_proba(X_test)[:, 1]
+    y_pred_proba = model.predict_proba(X_eval)[:, 1]
     
-    # Metrics
-    acc = accuracy_score(y_test, y_pred)
-    prec = precision_score(y_test, y_pred)
-    rec = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    roc_auc = roc_auc_score(y_test, y_pred_proba)
-    
-    results[name] = {
-        'Accuracy': acc,
-        'Precision': prec,
-        'Recall': rec,
-        'F1 Score': f1,
-        'ROC AUC': roc_auc
-    }
+    # Metrics: the probabilities are sorted once; the 0.5 cutoff, both AUCs
+    # and the whole threshold curve come from the same cumulative counts
+    curve = ScoreCurve.from_scores(y_test, y_pred_proba)
+    results[name] = curve.metrics(0.5)
+    curves[name] = curve.curve()
+    best = curve.best_threshold('F1 Score')
     
     print(f"\n{name}:")
-    print(f"  Accuracy: {acc:.4f}")
-    print(f"  Precision: {prec:.4f}")
-    print(f"  Recall: {rec:.4f}")
-    print(f"  F1 Score: {f1:.4f}")
-    print(f"  ROC AUC: {roc_auc:.4f}")
+    for metric, value in results[name].items():
+        print(f"  {metric}: {value:.4f}")
+    print(f"  Mejor umbral por F1: {best['Umbral']:.3f} (F1 {best['F1 Score']:.4f}, "
+          f"precision {best['Precision']:.4f}, recall {best['Recall']:.4f})")
+    print(f"  Tiempo de entrenamiento: {fit_time:.2f}s")
+    costs[name] = {'Tiempo (s)': fit_time, 'Tamaño (MB)': model_size(model)}
+    print(f"  Tamaño del modelo: {costs[name]['Tamaño (MB)']:.2f} MB")
+    if args.memoria:
+        print(f"  Memoria pico de entrenamiento: {fit_memory:.1f} MB")
+        costs[name]['Memoria (MB)'] = fit_memory
+    if name in native_models:
+        print(f"  Iteraciones (parada temprana): {model.n_iter_} de {model.max_iter}")
     
     # Confusion Matrix
-    cm = confusion_matrix(y_test, y_pred)
+    cm = curve.confusion(0.5)
     plt.figure(figsize=(5, 4))
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
     plt.title(f'Matriz de Confusión - {name}')
@@ -95,28 +129,51 @@ for name, model in models.items():
     plt.savefig(f'Modeling/cm_{name.replace(" ", "_").lower()}.png')
     plt.close()
 
-# Feature Importance (Random Forest)
-rf_model = models['Random Forest']
-rf_pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                              ('classifier', rf_model)])
-rf_pipeline.fit(X_train, y_train)
+print("\n--- Comparación (holdout) ---")
+print(pd.DataFrame(results).T.join(pd.DataFrame(costs).T).round(4).to_string())
 
-# Get feature names
-onehot_columns = rf_pipeline.named_steps['preprocessor'].named_transformers_['cat'].get_feature_names_out(categorical_cols)
-feature_names = numerical_cols + list(onehot_columns)
+# Precision and recall over every threshold, one line per model
+fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+for name, curve in curves.items():
+    axes[0].plot(curve['Recall'], curve['Precision'], label=f"{name} (PR AUC {results[name]['PR AUC']:.3f})")
+    axes[1].plot(curve['Umbral'], curve['F1 Score'], label=name)
+axes[0].set(title='Precision-Recall (holdout)', xlabel='Recall', ylabel='Precision')
+axes[1].set(title='F1 por umbral (holdout)', xlabel='Umbral', ylabel='F1 Score')
+for ax in axes:
+    ax.legend(fontsize=8)
+plt.tight_layout()
+plt.savefig('Modeling/curvas_umbral.png')
+plt.close()
 
-importances = rf_pipeline.named_steps['classifier'].feature_importances_
-indices = np.argsort(importances)[::-1]
+# Register the production model: Random Forest refit on the full dataset
+# (loaded instead if this data and recipe are already registered), with the
+# holdout metrics above as metadata
+start = time.perf_counter()
+churn_model, metadata, loaded = load_churn_model(df)
+metadata = update_metadata(CHURN_MODEL, metadata['key'], metrics=results['Random Forest'])
+action = 'cargado del registro' if loaded else 'entrenado y registrado'
+print(f"\nModelo de producción {action} en {time.perf_counter() - start:.2f}s "
+      f"(clave {metadata['key'][:12]})")
 
-print("\n--- Top 10 Importancia de Features (Random Forest) ---")
-for i in range(10):
-    print(f"{feature_names[indices[i]]}: {importances[indices[i]]:.4f}")
+# Permutation importance of the production recipe per original column, on the
+# holdout rows. The production model was fitted on them, so the Random Forest
+# evaluated above (same parameters, fitted on the train rows) is permuted
+# instead; cached next to the artifact, where the dashboards read it
+start = time.perf_counter()
+holdout_model = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', models['Random Forest'])])
+importances, info, cached = cached_importance(CHURN_MODEL, metadata['key'], lambda: holdout_model,
+                                              X_test_raw, y_test, n_jobs=args.jobs)
+action = 'leída de la caché' if cached else f"calculada ({info['n_repeats']} repeticiones, {args.jobs} procesos)"
+print(f"\n--- Importancia por Permutación (caída de ROC AUC), {action} en {time.perf_counter() - start:.2f}s ---")
+for column, row in importances.iterrows():
+    print(f"{column}: {row['Importancia']:.4f} ± {row['Desviacion']:.4f}")
 
 # Plot Feature Importance
 plt.figure(figsize=(10, 6))
-plt.title("Importancia de Features (Random Forest)")
-plt.bar(range(10), importances[indices[:10]], align="center")
-plt.xticks(range(10), [feature_names[i] for i in indices[:10]], rotation=45, ha='right')
+plt.title("Importancia por Permutación (Random Forest)")
+plt.bar(range(len(importances)), importances['Importancia'], yerr=importances['Desviacion'], align="center")
+plt.xticks(range(len(importances)), importances.index, rotation=45, ha='right')
+plt.ylabel('Caída de ROC AUC')
 plt.tight_layout()
 plt.savefig('Modeling/feature_importance_rf.png')
 plt.close()
@@ -0,0 +1,59 @@
+"""Permutation importance of a registered model (importance.py).
+
+Shuffles each original column of the holdout rows of modeling_pipeline.py
+``--repeticiones`` times and reports the mean drop in ROC AUC of the
+persisted model's recipe refitted on the train rows (the artifact itself
+was fitted on the holdout rows too), with the (column x repeat) jobs
+spread over ``--jobs`` processes. The result is cached next to the
+artifact; the dashboards read that cache. modeling_pipeline.py already
+computes it for the production model; this script does it for any
+registered model or key.
+
+    python Modeling/permutation_importance.py
+    python Modeling/permutation_importance.py --modelo random_forest_compacto --repeticiones 10 --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+
+from sklearn.base import clone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset
+from importance import cached_importance
+from model_registry import CHURN_MODEL, load_model
+from preprocessing import raw_split
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importancia por permutación de un modelo registrado.')
+    parser.add_argument('--modelo', default=CHURN_MODEL, help='Nombre del modelo en el registro.')
+    parser.add_argument('--clave', default=None, help='Clave del artefacto (por defecto, el último).')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Permutaciones por columna.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Procesos en paralelo.')
+    args = parser.parse_args(argv)
+
+    try:
+        df = load_dataset('limpio')
+        pipeline, metadata = load_model(args.modelo, key=args.clave)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. Ejecuta primero Modeling/modeling_pipeline.py.")
+        sys.exit(1)
+    # Same holdout rows as modeling_pipeline.py
+    X_train, X_test, y_train, y_test = raw_split(df.drop('Target', axis=1), df['Target'],
+                                                 test_size=0.2, random_state=42)
+
+    start = time.perf_counter()
+    importances, info, cached = cached_importance(args.modelo, metadata['key'],
+                                                  lambda: clone(pipeline).fit(X_train, y_train), X_test, y_test,
+                                                  n_repeats=args.repeticiones, n_jobs=args.jobs)
+    action = 'leída de la caché' if cached else 'calculada'
+    print(f"Modelo {args.modelo} (clave {metadata['key'][:12]}): ROC AUC {info['baseline']:.4f} en "
+          f"{info['rows']:,} filas; importancia {action} en {time.perf_counter() - start:.2f}s")
+    print("\nCaída de ROC AUC al permutar cada columna:")
+    print(importances.to_string(float_format=lambda value: f'{value:.4f}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Out-of-core training of a baseline churn model.
+
+Every model of modeling_pipeline.py needs the whole training matrix in
+memory. This script reads the data in chunks instead and never holds more
+than one chunk (plus the held-out rows):
+
+1. One pass fits the preprocessing with partial statistics
+   (``preprocessing.StreamingPreprocessor``: running mean/variance of the
+   numeric columns, union of the categories).
+2. A logistic-loss ``SGDClassifier`` is trained with ``partial_fit`` chunk
+   by chunk, for ``--epocas`` passes over the file. Weights are averaged
+   over the updates, which smooths the noise between chunks.
+3. A fraction of the rows (``--evaluacion``, 20% by default) is held out
+   and only used for evaluation. Rows are picked by a hash of their
+   position in the file, so the split does not depend on the chunk size
+   and works when the whole file fits in one chunk.
+
+The pipeline is registered as ``sgd_incremental``, so batch_scoring.py can
+use it with ``--modelo sgd_incremental``.
+
+    python Modeling/streaming_training.py
+    python Modeling/streaming_training.py --chunksize 500
+    python Modeling/streaming_training.py --archivo historico.parquet --chunksize 200000 --epocas 3
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import log_loss, roc_auc_score
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import iter_dataset, iter_file
+from model_comparison import score
+from model_registry import CHURN_MODEL_VERSION, chunked_data_hash, save_model
+from preprocessing import StreamingPreprocessor, feature_columns
+
+STREAMING_MODEL = 'sgd_incremental'
+STREAMING_MODEL_PARAMS = {'loss': 'log_loss', 'alpha': 1e-4, 'average': True, 'random_state': 42}
+
+
+def split_holdout(chunks, fraction):
+    """Yield (training rows, held-out rows) of each chunk.
+
+    A row is held out when the hash of its position in the file falls in
+    the first ``fraction`` of the hash range: the same rows on every pass
+    and for any chunk size.
+    """
+    start = 0
+    for chunk in chunks:
+        positions = np.arange(start, start + len(chunk), dtype=np.uint64)
+        held_out = pd.util.hash_array(positions) % 10_000 < round(fraction * 10_000)
+        start += len(chunk)
+        yield chunk[~held_out], chunk[held_out]
+
+
+def train_streaming(open_chunks, target='Target', epochs=5, params=STREAMING_MODEL_PARAMS,
+                    holdout_fraction=0.2, random_state=42, progress=None):
+    """Fit preprocessing and an SGD classifier over the chunks of ``open_chunks()``.
+
+    ``open_chunks`` is called once per pass and returns a fresh iterator of
+    DataFrames; ``holdout_fraction`` of the rows is held out (see
+    ``split_holdout``) and kept in memory. ``progress`` is called with
+    (epoch, holdout ROC AUC, holdout log loss) after each epoch. Returns
+    (fitted Pipeline, holdout metrics, training info).
+    """
+    rng = np.random.default_rng(random_state)
+    preprocessor = None
+    held_out = []
+    rows = 0
+    for chunk, holdout_chunk in split_holdout(open_chunks(), holdout_fraction):
+        held_out.append(holdout_chunk)
+        if chunk.empty:
+            continue
+        X = chunk.drop(columns=target)
+        if preprocessor is None:
+            preprocessor = StreamingPreprocessor(*feature_columns(X))
+        preprocessor.partial_fit(X)
+        rows += len(chunk)
+    holdout = pd.concat(held_out, ignore_index=True) if held_out else None
+    if preprocessor is None or holdout.empty:
+        raise ValueError("No hay filas suficientes para separar entrenamiento y evaluación: "
+                         "revisa los datos o --evaluacion.")
+
+    X_holdout = preprocessor.transform(holdout.drop(columns=target))
+    y_holdout = holdout[target].to_numpy()
+    classifier = SGDClassifier(**params)
+    classes = np.array([0, 1])
+    for epoch in range(1, epochs + 1):
+        for chunk, _ in split_holdout(open_chunks(), holdout_fraction):
+            if chunk.empty:
+                continue
+            # SGD assumes shuffled samples; shuffle within the chunk
+            order = rng.permutation(len(chunk))
+            X = preprocessor.transform(chunk.drop(columns=target))[order]
+            classifier.partial_fit(X, chunk[target].to_numpy()[order], classes=classes)
+        if progress is not None:
+            proba = classifier.predict_proba(X_holdout)[:, 1]
+            progress(epoch, roc_auc_score(y_holdout, proba), log_loss(y_holdout, proba))
+
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+    metrics = score(y_holdout, classifier.predict_proba(X_holdout)[:, 1])
+    info = {'training_rows': rows, 'holdout_rows': len(holdout), 'epochs': epochs}
+    return pipeline, metrics, info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Entrenamiento por bloques (fuera de memoria) de un modelo base de churn.')
+    parser.add_argument('--archivo', default=None,
+                        help='CSV o Parquet con las columnas del dataset limpio (por defecto, el dataset limpio).')
+    parser.add_argument('--chunksize', type=int, default=50_000,
+                        help='Filas por bloque.')
+    parser.add_argument('--evaluacion', type=float, default=0.2,
+                        help='Fracción de filas reservada para evaluación.')
+    parser.add_argument('--epocas', type=int, default=5, help='Pasadas de SGD sobre los bloques.')
+    parser.add_argument('--alpha', type=float, default=STREAMING_MODEL_PARAMS['alpha'],
+                        help='Regularización L2 del SGDClassifier.')
+    parser.add_argument('--no-registrar', action='store_true', help='No guardar el modelo en el registro.')
+    args = parser.parse_args(argv)
+    if not 0 < args.evaluacion < 1:
+        parser.error('--evaluacion debe estar entre 0 y 1.')
+
+    def open_chunks():
+        if args.archivo:
+            return iter_file(args.archivo, args.chunksize)
+        return iter_dataset('limpio', args.chunksize)
+
+    def progress(epoch, auc, loss):
+        print(f"  Época {epoch}: ROC AUC {auc:.4f}, log loss {loss:.4f} (filas reservadas)")
+
+    params = {**STREAMING_MODEL_PARAMS, 'alpha': args.alpha}
+    print(f"--- Entrenamiento por bloques de {args.chunksize:,} filas ---")
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        pipeline, metrics, info = train_streaming(open_chunks, epochs=args.epocas, params=params,
+                                                  holdout_fraction=args.evaluacion, progress=progress)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. Ejecuta primero EDA/eda_script.py.")
+        sys.exit(1)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    training_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\nFilas de entrenamiento: {info['training_rows']:,}; reservadas: {info['holdout_rows']:,}")
+    print(f"Tiempo: {training_time:.2f}s; memoria pico: {peak / 1e6:.1f} MB")
+    for metric, value in metrics.items():
+        print(f"  {metric}: {value:.4f}")
+
+    if args.no_registrar:
+        return
+    # The key covers the data and everything that changes the fitted model
+    recipe = {**params, 'epochs': args.epocas, 'chunksize': args.chunksize,
+              'holdout_fraction': args.evaluacion}
+    metadata = save_model(STREAMING_MODEL, pipeline, chunked_data_hash(open_chunks()), recipe,
+                          CHURN_MODEL_VERSION, metrics=metrics, training_time=training_time)
+    print(f"Modelo registrado como '{STREAMING_MODEL}' (clave {metadata['key'][:12]})")
+
+
+if __name__ == '__main__':
+    main()
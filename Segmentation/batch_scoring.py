@@ -0,0 +1,188 @@
+"""Streaming batch scoring with the registered churn model.
+
+Reads an input file (CSV or Parquet) in fixed-size chunks, scores each
+chunk with the persisted pipeline, assigns Segmento_Riesgo and appends it
+to the output file, so memory depends on the chunk size and not on the
+number of customers.
+
+With ``--jobs N`` the chunks are scored as shards in N worker processes
+(at most one per core: extra processes only add overhead). Each worker
+loads the registered pipeline once, whatever its model, and only the
+feature columns are sent to it; the results are written in input order.
+
+With ``--incremental`` rows whose model inputs were already scored by the
+same model are taken from the score cache (score_cache.py) and only new or
+changed rows are sent to the model.
+
+    python Segmentation/batch_scoring.py clientes.csv clientes_puntuados.parquet
+    python Segmentation/batch_scoring.py clientes.csv salida.csv --chunksize 50000
+    python Segmentation/batch_scoring.py clientes.parquet salida.parquet --jobs 4
+    python Segmentation/batch_scoring.py clientes.parquet salida.parquet --incremental
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import DEFAULT_LOCALE, LOCALES, TableWriter, iter_file
+from model_registry import CHURN_MODEL, load_model
+from score_cache import ScoreCache
+from segments import RISK_CUTOFFS, assign_segments
+
+# Pipeline of each worker process, loaded once by _init_worker
+_pipeline = None
+
+
+def add_scores(chunk, probabilities, cutoffs=RISK_CUTOFFS):
+    """``chunk`` with Probabilidad_Churn and Segmento_Riesgo added."""
+    chunk = chunk.copy()
+    chunk['Probabilidad_Churn'] = probabilities
+    chunk['Segmento_Riesgo'] = assign_segments(probabilities, cutoffs)
+    return chunk
+
+
+def _split_cached(cache, X):
+    """(rows of ``X`` to score, function completing their probabilities).
+
+    Without a cache every row is scored. The completion function takes
+    the probabilities of the rows to score and returns those of all rows.
+    """
+    if cache is None:
+        return X, lambda scored: scored
+    fingerprints, probabilities = cache.lookup(X)
+    missing = np.isnan(probabilities)
+
+    def complete(scored):
+        probabilities[missing] = scored
+        cache.store(fingerprints[missing], scored)
+        return probabilities
+
+    return X[missing], complete
+
+
+def _init_worker(model, key):
+    global _pipeline
+    _pipeline, _ = load_model(model, key=key)
+
+
+def _score_shard(features):
+    return _pipeline.predict_proba(features)[:, 1]
+
+
+def _score_sharded(chunks, writer, model, key, features, n_jobs, on_chunk, cutoffs, cache):
+    """Score ``chunks`` in ``n_jobs`` workers, writing them in input order.
+
+    At most ``2 * n_jobs`` shards are in flight, so memory stays bounded.
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(model, key)) as pool:
+        pending = deque()
+
+        def write_next():
+            chunk, complete, future = pending.popleft()
+            scored = future.result() if future is not None else np.empty(0)
+            writer.write(add_scores(chunk, complete(scored), cutoffs))
+            on_chunk()
+
+        for chunk in chunks:
+            rows, complete = _split_cached(cache, chunk[features])
+            future = pool.submit(_score_shard, rows) if len(rows) else None
+            pending.append((chunk, complete, future))
+            if len(pending) >= 2 * n_jobs:
+                write_next()
+        while pending:
+            write_next()
+
+
+def score_file(input_path, output_path, chunksize, model=CHURN_MODEL, key=None,
+               locale=DEFAULT_LOCALE, progress=None, n_jobs=1, cutoffs=RISK_CUTOFFS,
+               incremental=False):
+    """Score ``input_path`` chunk by chunk into ``output_path``.
+
+    ``key`` selects a registered artifact (default: the latest one saved
+    under ``model``). With ``n_jobs > 1`` the chunks are scored in worker
+    processes that load the pipeline once each. ``cutoffs`` are
+    the segment probability bands (see segments.py). ``locale`` is the
+    language of the column names of the input and of the output, segment
+    labels included; the chunks are scored under the canonical names of
+    the model. With ``incremental`` only rows missing from the model's
+    score cache are scored. ``progress`` is called with (rows, seconds) after each chunk.
+    Returns (rows written, seconds, model metadata, score cache or None).
+    """
+    pipeline, metadata = load_model(model, key=key)
+    features = list(pipeline.feature_names_in_)
+    cache = ScoreCache(model, metadata['key']) if incremental else None
+    start = time.perf_counter()
+    with TableWriter(output_path, stored_locale=locale) as writer:
+        def on_chunk():
+            if progress is not None:
+                progress(writer.rows, time.perf_counter() - start)
+
+        # Canonical names in memory, ``locale`` names on disk
+        chunks = iter_file(input_path, chunksize, source_locale=locale)
+        if n_jobs > 1:
+            _score_sharded(chunks, writer, model, metadata['key'], features, n_jobs, on_chunk, cutoffs, cache)
+        else:
+            for chunk in chunks:
+                rows, complete = _split_cached(cache, chunk[features])
+                scored = pipeline.predict_proba(rows)[:, 1] if len(rows) else np.empty(0)
+                writer.write(add_scores(chunk, complete(scored), cutoffs))
+                on_chunk()
+    if cache is not None:
+        cache.save()
+    return writer.rows, time.perf_counter() - start, metadata, cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Puntúa clientes por bloques con el modelo registrado.')
+    parser.add_argument('entrada', help='Archivo de clientes (CSV o Parquet).')
+    parser.add_argument('salida', help='Archivo de salida (CSV o Parquet, según la extensión).')
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                        help='Filas por bloque (por defecto 100000).')
+    parser.add_argument('--modelo', default=CHURN_MODEL,
+                        help=f'Nombre del modelo en el registro (por defecto {CHURN_MODEL}).')
+    parser.add_argument('--clave', default=None,
+                        help='Clave del artefacto a usar (por defecto, el último registrado).')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Procesos que puntúan los bloques en paralelo (modelo compartido en memoria).')
+    parser.add_argument('--cortes', type=float, nargs=2, default=RISK_CUTOFFS, metavar=('BAJO', 'MEDIO'),
+                        help='Probabilidad máxima de Bajo Riesgo y de Riesgo Medio (por defecto 0.3 0.7).')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reutilizar las puntuaciones de filas sin cambios (mismo modelo).')
+    parser.add_argument('--idioma', default=DEFAULT_LOCALE, choices=sorted(LOCALES),
+                        help='Idioma de los nombres de columna de la entrada y la salida.')
+    args = parser.parse_args(argv)
+
+    def progress(rows, seconds):
+        print(f"  {rows:,} filas ({rows / seconds:,.0f} filas/s)", end='\r', flush=True)
+
+    # More processes than cores only adds the cost of sending the shards
+    cores = os.cpu_count() or 1
+    if args.jobs > cores:
+        print(f"--jobs {args.jobs} con {cores} núcleo(s): se usan {cores} proceso(s).")
+    jobs = min(args.jobs, cores)
+
+    try:
+        rows, seconds, metadata, cache = score_file(args.entrada, args.salida, args.chunksize,
+                                             model=args.modelo, key=args.clave,
+                                             locale=args.idioma, progress=progress,
+                                             n_jobs=jobs, cutoffs=args.cortes,
+                                             incremental=args.incremental)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. "
+              "Ejecuta primero Modeling/modeling_pipeline.py o revisa la ruta de entrada.")
+        sys.exit(1)
+    print(f"\nModelo: {args.modelo} (clave {metadata['key'][:12]})")
+    print(f"Filas puntuadas: {rows:,} en {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} filas/s)")
+    if cache is not None:
+        print(f"Filas nuevas o modificadas: {cache.misses:,}; reutilizadas de la caché: {cache.hits:,}")
+    print(f"Resultados guardados en '{args.salida}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Risk cutoffs that maximize the value of the retention interventions.
+
+Each risk segment gets an intervention with a cost per customer and a
+benefit per churner reached (retained value times success rate), read
+from a table with one row per segment (RETENTION_ECONOMICS or
+``--tabla``). A customer in segment ``s`` is worth
+``Target * Beneficio[s] - Coste[s]``.
+
+The scored customers are reduced to churners and customers per distinct
+Probabilidad_Churn (evaluation.ScoreCurve: one sort, chunk by chunk, so
+millions of rows fit). Cumulative sums of the value of each segment over
+the sorted scores give the total value of any pair of cutoffs in O(1);
+the best pair over all distinct scores comes from a running maximum over
+the lower cutoff, and ``value_surface`` evaluates a grid of k x k pairs at
+once for the report and the heatmap. No frame is filtered per pair.
+
+    python Segmentation/cutoff_optimizer.py
+    python Segmentation/cutoff_optimizer.py --archivo clientes_puntuados.parquet --tabla costes.csv --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import RISK_SEGMENTS, iter_dataset, iter_file
+from evaluation import evaluate_chunks
+from segments import RISK_CUTOFFS
+
+# Illustrative economics per segment: cost of the intervention per customer
+# and value recovered per churner it reaches. Replace with business figures
+RETENTION_ECONOMICS = pd.DataFrame({
+    'Coste': [0.0, 5.0, 25.0],        # nothing / coupon e-mail / call + discount
+    'Beneficio': [0.0, 40.0, 150.0],
+}, index=pd.Index(RISK_SEGMENTS, name='Segmento'))
+
+
+def read_economics(path):
+    """Cost/benefit table from a CSV with columns Segmento, Coste and Beneficio."""
+    table = pd.read_csv(path).set_index('Segmento')
+    missing = [segment for segment in RISK_SEGMENTS if segment not in table.index]
+    if missing or not {'Coste', 'Beneficio'} <= set(table.columns):
+        raise ValueError(f"La tabla debe tener las columnas Segmento, Coste y Beneficio y una fila "
+                         f"por segmento ({', '.join(RISK_SEGMENTS)}).")
+    return table.loc[RISK_SEGMENTS, ['Coste', 'Beneficio']].astype(float)
+
+
+def cumulative_values(curve, economics=RETENTION_ECONOMICS):
+    """Value of the lowest ``i`` distinct scores in each segment, for i = 0..d.
+
+    Array of shape (d + 1, 3): column ``s`` of row ``i`` is the total value
+    of the customers with the ``i`` lowest distinct scores if they were all
+    in segment ``s``.
+    """
+    economics = economics.loc[RISK_SEGMENTS]
+    customers = curve.positives + curve.negatives
+    values = (np.outer(curve.positives, economics['Beneficio'])
+              - np.outer(customers, economics['Coste']))
+    return np.vstack([np.zeros(len(RISK_SEGMENTS)), np.cumsum(values, axis=0)])
+
+
+def _pair_value(cumulative, i, j):
+    # Lowest i distinct scores in Bajo, the next j - i in Medio, the rest in Alto
+    low, mid, high = cumulative.T
+    return low[i] + mid[j] - mid[i] + high[-1] - high[j]
+
+
+def _positions(curve, cutoffs):
+    # Distinct scores at or below each cutoff (segments.band_codes: p <= cutoff)
+    return np.searchsorted(curve.scores, np.asarray(cutoffs, dtype=float), side='right')
+
+
+def cutoff_value(curve, cutoffs, economics=RETENTION_ECONOMICS):
+    """Total value of the segments defined by ``cutoffs`` (low, high)."""
+    i, j = _positions(curve, cutoffs)
+    return float(_pair_value(cumulative_values(curve, economics), i, j))
+
+
+def segment_summary(curve, cutoffs, economics=RETENTION_ECONOMICS):
+    """Customers, churners, cost, benefit and value of each segment."""
+    bounds = np.concatenate([[0], _positions(curve, cutoffs), [curve.scores.size]])
+    positives = np.add.reduceat(np.append(curve.positives, 0), bounds[:-1])
+    customers = np.add.reduceat(np.append(curve.positives + curve.negatives, 0), bounds[:-1])
+    # reduceat gives the element itself for empty ranges
+    empty = bounds[1:] == bounds[:-1]
+    positives[empty] = customers[empty] = 0
+    economics = economics.loc[RISK_SEGMENTS]
+    cost = customers * economics['Coste'].to_numpy()
+    benefit = positives * economics['Beneficio'].to_numpy()
+    return pd.DataFrame({'Clientes': customers, 'Churn': positives, 'Coste': cost,
+                         'Beneficio': benefit, 'Valor': benefit - cost},
+                        index=pd.Index(RISK_SEGMENTS, name='Segmento_Riesgo'))
+
+
+def optimize_cutoffs(curve, economics=RETENTION_ECONOMICS):
+    """Pair of cutoffs with the largest total value, over all distinct scores.
+
+    Returns (cutoffs, value). ``value(i, j)`` for the lowest ``i`` distinct
+    scores in Bajo and ``j - i`` in Medio splits into a term of ``i`` and a
+    term of ``j``, so the best ``i < j`` for every ``j`` is a running
+    maximum: the search is linear in the number of distinct scores.
+    """
+    if curve.scores.size == 0:
+        raise ValueError("No hay clientes puntuados.")
+    low, mid, high = cumulative_values(curve, economics).T
+    left = low - mid
+    best_left = np.maximum.accumulate(left)
+    # Index of the running maximum (last position that reaches it)
+    best_i = np.maximum.accumulate(np.where(left == best_left, np.arange(left.size), 0))
+    totals = best_left[:-1] + (mid - high)[1:] + high[-1]
+    j = int(np.argmax(totals)) + 1
+    i = int(best_i[j - 1])
+    # Cutoff i keeps the i lowest distinct scores below it (p <= cutoff)
+    scores = curve.scores
+    cutoffs = [float(np.nextafter(scores[0], -np.inf)) if k == 0 else float(scores[k - 1]) for k in (i, j)]
+    return cutoffs, float(totals[j - 1])
+
+
+def value_surface(curve, grid, economics=RETENTION_ECONOMICS):
+    """Total value of every pair of cutoffs on ``grid`` (NaN where low >= high)."""
+    grid = np.asarray(grid, dtype=float)
+    cumulative = cumulative_values(curve, economics)
+    positions = _positions(curve, grid)
+    values = _pair_value(cumulative, positions[:, None], positions[None, :])
+    values = np.where(grid[:, None] < grid[None, :], values, np.nan)
+    return pd.DataFrame(values, index=pd.Index(grid, name='Corte Bajo'),
+                        columns=pd.Index(grid, name='Corte Medio'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cortes de riesgo que maximizan el valor de la retención.')
+    parser.add_argument('--archivo', default=None,
+                        help='CSV o Parquet con Target y Probabilidad_Churn (por defecto, el dataset segmentado).')
+    parser.add_argument('--tabla', default=None,
+                        help='CSV con columnas Segmento, Coste y Beneficio (por defecto, RETENTION_ECONOMICS).')
+    parser.add_argument('--malla', type=int, default=101,
+                        help='Puntos por eje de la superficie de valor (por defecto 101: pasos de 0.01).')
+    parser.add_argument('--chunksize', type=int, default=500_000, help='Filas por bloque.')
+    parser.add_argument('--jobs', type=int, default=1, help='Procesos para reducir los bloques.')
+    args = parser.parse_args(argv)
+
+    columns = ['Target', 'Probabilidad_Churn']
+    start = time.perf_counter()
+    try:
+        economics = read_economics(args.tabla) if args.tabla else RETENTION_ECONOMICS
+        chunks = (iter_file(args.archivo, args.chunksize, columns=columns) if args.archivo
+                  else iter_dataset('segmentado', args.chunksize, columns=columns))
+        curve = evaluate_chunks(chunks, n_jobs=args.jobs)
+        cutoffs, value = optimize_cutoffs(curve, economics)
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. "
+              "Ejecuta primero Segmentation/segmentation_analysis.py o revisa la ruta.")
+        sys.exit(1)
+    except (KeyError, ValueError) as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    rows = curve.n_positives + curve.n_negatives
+    print(f"{rows:,} clientes, {curve.scores.size:,} probabilidades distintas; optimizado en {elapsed:.2f}s")
+    print("\nEconomía por segmento (coste por cliente, beneficio por churn alcanzado):")
+    print(economics.to_string())
+
+    current = cutoff_value(curve, RISK_CUTOFFS, economics)
+    print(f"\nCortes actuales {RISK_CUTOFFS[0]:g} / {RISK_CUTOFFS[1]:g}: valor {current:,.0f}")
+    print(segment_summary(curve, RISK_CUTOFFS, economics).to_string(float_format=lambda v: f'{v:,.0f}'))
+    print(f"\nCortes óptimos {cutoffs[0]:.4g} / {cutoffs[1]:.4g}: valor {value:,.0f} "
+          f"({value - current:+,.0f} frente a los actuales)")
+    print(segment_summary(curve, cutoffs, economics).to_string(float_format=lambda v: f'{v:,.0f}'))
+    # Full precision: the cutoffs are distinct scores and rounding them moves
+    # the customers with those scores to another segment
+    print(f"\nPara aplicarlos: --cortes {cutoffs[0]!r} {cutoffs[1]!r} en segmentation_analysis.py o batch_scoring.py")
+
+    surface = value_surface(curve, np.linspace(0, 1, args.malla), economics)
+    plt.figure(figsize=(7, 6))
+    plt.imshow(surface.T.to_numpy(), origin='lower', extent=[0, 1, 0, 1], aspect='auto', cmap='viridis')
+    plt.colorbar(label='Valor de la retención')
+    plt.scatter([cutoffs[0]], [cutoffs[1]], color='red', marker='x', label='Óptimo')
+    plt.scatter([RISK_CUTOFFS[0]], [RISK_CUTOFFS[1]], color='white', marker='o', label='Actual')
+    plt.xlabel('Corte Bajo / Medio')
+    plt.ylabel('Corte Medio / Alto')
+    plt.title('Valor esperado de la retención por par de cortes')
+    plt.legend()
+    plt.savefig('Segmentation/valor_cortes.png')
+    plt.close()
+    print("Superficie de valor guardada en 'Segmentation/valor_cortes.png'")
+
+
+if __name__ == '__main__':
+    main()
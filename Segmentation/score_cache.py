@@ -0,0 +1,78 @@
+"""Per-row score cache for incremental rescoring.
+
+Each scored row is fingerprinted with a 64-bit hash of its model input
+columns, and the fingerprint is stored with the Probabilidad_Churn it got.
+On the next run only rows whose fingerprint is not in the cache (new
+customers or changed features) go through the model. The cache lives
+next to the model artifact in the registry (scores.joblib), so a
+different model version starts from an empty cache.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import artifact_dir
+
+
+def row_fingerprints(X):
+    """uint64 fingerprint of each row of ``X`` (values only, not the index)."""
+    return pd.util.hash_pandas_object(X, index=False).to_numpy()
+
+
+class ScoreCache:
+    """Fingerprint -> probability map of one registered model."""
+
+    def __init__(self, model, key):
+        self.path = os.path.join(artifact_dir(model, key), 'scores.joblib')
+        if os.path.exists(self.path):
+            stored = joblib.load(self.path)
+            self.scores = pd.Series(stored['probabilities'], index=stored['fingerprints'])
+        else:
+            self.scores = pd.Series(dtype=float, index=pd.Index([], dtype='uint64'))
+        self.seen = []
+        self.new = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, X):
+        """(fingerprints, cached probabilities) of the rows of ``X``.
+
+        Rows that are not cached get NaN and must be scored and passed to
+        ``store``.
+        """
+        fingerprints = row_fingerprints(X)
+        probabilities = self.scores.reindex(fingerprints).to_numpy(dtype=float, copy=True)
+        missing = int(np.isnan(probabilities).sum())
+        self.seen.append(fingerprints)
+        self.misses += missing
+        self.hits += len(fingerprints) - missing
+        return fingerprints, probabilities
+
+    def store(self, fingerprints, probabilities):
+        """Record the probabilities of newly scored rows."""
+        self.new.append(pd.Series(probabilities, index=fingerprints))
+
+    def score(self, X, predict):
+        """Probabilities of the rows of ``X``, calling ``predict`` only on misses.
+
+        ``predict`` receives the subset of ``X`` to score and returns its
+        probabilities.
+        """
+        fingerprints, probabilities = self.lookup(X)
+        missing = np.isnan(probabilities)
+        if missing.any():
+            probabilities[missing] = predict(X[missing])
+            self.store(fingerprints[missing], probabilities[missing])
+        return probabilities
+
+    def save(self):
+        """Keep the scores of the rows seen in this run and write them."""
+        scores = pd.concat([self.scores] + self.new)
+        scores = scores[~scores.index.duplicated(keep='last')]
+        seen = np.unique(np.concatenate(self.seen)) if self.seen else np.empty(0, dtype='uint64')
+        joblib.dump({'fingerprints': seen, 'probabilities': scores.reindex(seen).to_numpy()}, self.path)
+        return self.path
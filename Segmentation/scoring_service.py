@@ -0,0 +1,345 @@
+"""Local HTTP scoring service with request micro-batching.
+
+Loads the registered churn forest once, compiled into node arrays with
+the preprocessing fused in (forest_arrays.py); any other registered model
+is served through its pipeline's ``predict_proba``. Requests go to a
+minimal HTTP/1.1 server built on asyncio (no web framework needed).
+Concurrent requests are queued and grouped into small batches: the
+batcher waits at most ``--espera-ms`` after the first queued record, or
+until ``--lote`` records are queued, and scores them with a single
+``predict_proba`` call in a worker thread so the event loop keeps
+accepting requests.
+
+    python Segmentation/scoring_service.py                  # http://127.0.0.1:8000
+    python Segmentation/scoring_service.py cliente --peticiones 2000 --concurrencia 64
+
+Endpoints:
+    POST /score    one record (JSON object) or a list of records; returns
+                   Probabilidad_Churn and Segmento_Riesgo for each
+    GET  /metrics  requests, records, batches, p50/p99 latency, throughput
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import DEFAULT_LOCALE, apply_schema, load_dataset
+from forest_arrays import ForestScorer, is_compilable, registry_forest
+from model_registry import CHURN_MODEL, load_model
+from segments import RISK_CUTOFFS, assign_segments
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class LatencyStats:
+    """Request counters and a window of recent latencies."""
+
+    def __init__(self, window=10_000):
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.records = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record(self, seconds, records):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.records += records
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if latencies.size else (np.nan, np.nan)
+        return {
+            'requests': self.requests,
+            'records': self.records,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch_size': self.records / self.batches if self.batches else 0.0,
+            'latency_p50_ms': None if np.isnan(p50) else round(float(p50), 3),
+            'latency_p99_ms': None if np.isnan(p99) else round(float(p99), 3),
+            'throughput_records_per_s': round(self.records / uptime, 1) if uptime else 0.0,
+            'uptime_s': round(uptime, 1),
+        }
+
+
+class PipelineScorer:
+    """The ``ForestScorer`` interface over a fitted pipeline of any model."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.features = list(pipeline.feature_names_in_)
+
+    def predict_proba(self, X):
+        return self.pipeline.predict_proba(X[self.features])[:, 1]
+
+
+class MicroBatcher:
+    """Group queued records into batches for one ``predict_proba`` call.
+
+    ``scorer`` is a ``ForestScorer`` for forests, several times faster than
+    the pipeline on batches of this size, or a ``PipelineScorer``.
+    """
+
+    def __init__(self, scorer, stats, max_batch=64, max_wait=0.002,
+                 locale=DEFAULT_LOCALE, cutoffs=RISK_CUTOFFS):
+        self.scorer = scorer
+        self.features = list(scorer.features)
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.locale = locale
+        self.cutoffs = cutoffs
+        self.queue = asyncio.Queue()
+
+    def _coerce(self, records):
+        # Cast to the schema here, so that a malformed record fails its own
+        # request instead of the micro-batch it would be grouped into
+        missing = sorted({col for record in records for col in self.features if col not in record})
+        if missing:
+            raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+        frame = pd.DataFrame.from_records(records, columns=self.features)
+        try:
+            frame = apply_schema(frame, self.locale)
+        except (ValueError, TypeError) as error:
+            raise ValueError(f"Valores no válidos: {error}") from None
+        return frame.astype(object).to_dict('records')
+
+    async def score(self, records):
+        """Score a list of records (dicts); returns one result dict per record.
+
+        Raises ValueError when a record lacks a column or a value does not
+        fit the schema.
+        """
+        records = self._coerce(records)
+        loop = asyncio.get_running_loop()
+        futures = []
+        for record in records:
+            future = loop.create_future()
+            await self.queue.put((record, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    def _predict(self, records):
+        frame = apply_schema(pd.DataFrame.from_records(records, columns=self.features), self.locale)
+        probabilities = self.scorer.predict_proba(frame)
+        segments = assign_segments(probabilities, self.cutoffs).astype(str)
+        return [{'Probabilidad_Churn': float(p), 'Segmento_Riesgo': s}
+                for p, s in zip(probabilities, segments)]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            records, futures = zip(*batch)
+            try:
+                results = await loop.run_in_executor(None, self._predict, list(records))
+            except Exception as error:  # the whole batch fails; report it to every caller
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats.batches += 1
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+async def _read_request(reader):
+    """(method, path, headers, body) of the next request, or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+    return method, path, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+class ScoringService:
+    """asyncio HTTP front end of a ``MicroBatcher``."""
+
+    def __init__(self, batcher, stats):
+        self.batcher = batcher
+        self.stats = stats
+
+    async def handle(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, self.stats.snapshot()
+        if path != '/score':
+            return 404, {'error': f"Ruta desconocida: {path}"}
+        if method != 'POST':
+            return 405, {'error': 'Usa POST /score'}
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body or b'null')
+            records = payload if isinstance(payload, list) else [payload]
+            if not records or not all(isinstance(record, dict) for record in records):
+                raise ValueError('Se espera un objeto JSON o una lista de objetos')
+            results = await self.batcher.score(records)
+        except (ValueError, TypeError) as error:
+            self.stats.errors += 1
+            return 400, {'error': str(error)}
+        self.stats.record(time.perf_counter() - start, len(records))
+        return 200, results if isinstance(payload, list) else results[0]
+
+    async def connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as error:
+                    self.stats.errors += 1
+                    status, payload = 500, {'error': str(error)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, model=CHURN_MODEL, key=None, max_batch=64, max_wait_ms=2.0):
+    pipeline, metadata = load_model(model, key=key)
+    if is_compilable(pipeline):
+        scorer = ForestScorer(registry_forest(model, key=metadata['key']))
+    else:
+        scorer = PipelineScorer(pipeline)
+    stats = LatencyStats()
+    batcher = MicroBatcher(scorer, stats, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+    service = ScoringService(batcher, stats)
+    batcher_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(service.connection, host, port)
+    engine = 'bosque compilado' if isinstance(scorer, ForestScorer) else 'pipeline'
+    print(f"Modelo {model} (clave {metadata['key'][:12]}) cargado ({engine}).")
+    print(f"Servicio de puntuación en http://{host}:{port} (POST /score, GET /metrics)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+
+
+async def _client_request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  "Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split()[1]), json.loads(data)
+
+
+async def run_client(host, port, requests, concurrency, seed=0):
+    """Send ``requests`` single-customer requests over ``concurrency`` connections.
+
+    Records are sampled from the cleaned dataset. Returns the service
+    metrics after the run.
+    """
+    records = load_dataset('limpio').drop(columns='Target').astype(object).to_dict('records')
+    sample = random.Random(seed)
+    per_connection = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    async def worker(count):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in range(count):
+                status, result = await _client_request(reader, writer, host, 'POST', '/score',
+                                                       sample.choice(records))
+                if status != 200:
+                    raise RuntimeError(f"Respuesta {status}: {result}")
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(count) for count in per_connection if count))
+    elapsed = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await _client_request(reader, writer, host, 'GET', '/metrics')
+    writer.close()
+    return elapsed, metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servicio HTTP local de puntuación de churn.')
+    parser.add_argument('modo', nargs='?', default='servidor', choices=['servidor', 'cliente'],
+                        help='servidor (por defecto) o cliente de prueba contra un servidor local.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--modelo', default=CHURN_MODEL, help='Nombre del modelo en el registro.')
+    parser.add_argument('--clave', default=None, help='Clave del artefacto (por defecto, el último).')
+    parser.add_argument('--lote', type=int, default=64, help='Tamaño máximo de cada micro-lote.')
+    parser.add_argument('--espera-ms', type=float, default=2.0,
+                        help='Espera máxima para completar un micro-lote, en ms.')
+    parser.add_argument('--peticiones', type=int, default=1000, help='(cliente) Peticiones a enviar.')
+    parser.add_argument('--concurrencia', type=int, default=32, help='(cliente) Conexiones simultáneas.')
+    args = parser.parse_args(argv)
+
+    if args.modo == 'cliente':
+        elapsed, metrics = asyncio.run(run_client(args.host, args.puerto, args.peticiones, args.concurrencia))
+        print(f"{args.peticiones:,} peticiones en {elapsed:.2f}s ({args.peticiones / elapsed:,.0f} peticiones/s)")
+        print(json.dumps(metrics, indent=2))
+        return
+    try:
+        asyncio.run(serve(args.host, args.puerto, args.modelo, args.clave, args.lote, args.espera_ms))
+    except FileNotFoundError as error:
+        print(f"Error: no se encontró {error.filename or error}. Ejecuta primero Modeling/modeling_pipeline.py.")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
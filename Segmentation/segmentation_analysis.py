@@ -1,74 +1,77 @@
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import load_dataset, save_dataset
+from model_registry import CHURN_MODEL, load_churn_model
+from score_cache import ScoreCache
+from segments import RISK_CUTOFFS, segment_profile
+
+parser = argparse.ArgumentParser(description='Segmentación de clientes por riesgo de churn.')
+parser.add_argument('--cortes', type=float, nargs=2, default=RISK_CUTOFFS, metavar=('BAJO', 'MEDIO'),
+                    help='Probabilidad máxima de Bajo Riesgo y de Riesgo Medio (por defecto 0.3 0.7).')
+args = parser.parse_args()
 
 # Load data
 try:
-    df = pd.read_csv('datos/dataset_ecommerce_limpio_es.csv')
+    df = load_dataset('limpio')
     print("Data loaded successfully.")
 except FileNotFoundError:
     print("Error: File not found. Please run EDA first.")
     exit()
 
-# Preprocessing
+# Features
 X = df.drop('Target', axis=1)
-y = df['Target']
-
-categorical_cols = X.select_dtypes(include=['object']).columns.tolist()
-numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
-
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', StandardScaler(), numerical_cols),
-        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_cols)
-    ])
 
-# Train Random Forest (Full dataset for segmentation)
-rf_model = RandomForestClassifier(random_state=42)
-pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                           ('classifier', rf_model)])
+# Random Forest trained on the full dataset: loaded from the model registry
+# (trained and registered only if Modeling has not saved it for this data)
+start = time.perf_counter()
+pipeline, metadata, loaded = load_churn_model(df)
+if loaded:
+    print(f"Modelo Random Forest cargado del registro en {time.perf_counter() - start:.3f}s "
+          f"(clave {metadata['key'][:12]})")
+else:
+    print(f"Modelo Random Forest entrenado en dataset completo y registrado en {time.perf_counter() - start:.2f}s")
 
-print("Entrenando modelo Random Forest en dataset completo...")
-pipeline.fit(X, y)
-
-# Predict Probabilities
-churn_probs = pipeline.predict_proba(X)[:, 1]
+# Predict Probabilities: only rows whose model inputs changed since the
+# last run with this model are scored; the rest come from the score cache
+cache = ScoreCache(CHURN_MODEL, metadata['key'])
+churn_probs = cache.score(X[list(pipeline.feature_names_in_)],
+                          lambda rows: pipeline.predict_proba(rows)[:, 1])
+cache.save()
+print(f"Filas puntuadas: {cache.misses:,} nuevas o modificadas, {cache.hits:,} reutilizadas")
 df['Probabilidad_Churn'] = churn_probs
 
-# Define Segments
-def define_segment(prob):
-    if prob > 0.7:
-        return 'Alto Riesgo'
-    elif prob > 0.3:
-        return 'Riesgo Medio'
-    else:
-        return 'Bajo Riesgo'
-
-df['Segmento_Riesgo'] = df['Probabilidad_Churn'].apply(define_segment)
+# Define Segments: vectorized banding, with counts and profile means in the same pass
+numeric_cols_for_profile = ['Antiguedad', 'Monto_Cashback', 'Nivel_Satisfaccion', 'Dias_Ultima_Compra', 'Probabilidad_Churn']
+df['Segmento_Riesgo'], profile = segment_profile(df, 'Probabilidad_Churn', numeric_cols_for_profile,
+                                                 cutoffs=args.cortes)
+print(f"Cortes de probabilidad: {args.cortes[0]:g} / {args.cortes[1]:g}")
 
 # Segment Distribution
 print("\n--- Distribución de Segmentos ---")
-print(df['Segmento_Riesgo'].value_counts(normalize=True))
+print(profile[['Clientes', 'Proporcion']])
 
 # Segment Profiles
 print("\n--- Perfiles de Segmentos (Valores Promedio) ---")
-numeric_cols_for_profile = ['Antiguedad', 'Monto_Cashback', 'Nivel_Satisfaccion', 'Dias_Ultima_Compra', 'Probabilidad_Churn']
-profile = df.groupby('Segmento_Riesgo')[numeric_cols_for_profile].mean()
-print(profile)
+print(profile[numeric_cols_for_profile])
 
 # Save Segmented Data
-df.to_csv('datos/dataset_ecommerce_segmentado_es.csv', index=False)
-print("\nDataset segmentado guardado en 'datos/dataset_ecommerce_segmentado_es.csv'")
+output_path = save_dataset(df, 'segmentado')
+print(f"\nDataset segmentado guardado en '{os.path.relpath(output_path)}'")
 
 # Visualize Segments
 plt.figure(figsize=(8, 5))
-sns.countplot(x='Segmento_Riesgo', data=df, order=['Bajo Riesgo', 'Riesgo Medio', 'Alto Riesgo'], palette='viridis')
+sns.barplot(x=profile.index.astype(str), y=profile['Clientes'].to_numpy(), hue=profile.index.astype(str),
+            palette='viridis', legend=False)
+plt.xlabel('Segmento_Riesgo')
+plt.ylabel('count')
 plt.title('Distribución de Clientes por Riesgo de Churn')
 plt.savefig('Segmentation/distribucion_segmentos_riesgo.png')
 print("Gráfico de distribución guardado en 'Segmentation/distribucion_segmentos_riesgo.png'")
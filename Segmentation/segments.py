@@ -0,0 +1,69 @@
+"""Risk segment assignment shared by the segmentation scripts.
+
+Segments are bands of the churn probability delimited by increasing
+cutoffs: a probability ``p`` falls in band ``i`` when
+``cutoffs[i - 1] < p <= cutoffs[i]``. The assignment is one
+``np.searchsorted`` over the whole column, and the per-band counts and
+profile means come from ``np.bincount`` on the same band codes.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import RISK_SEGMENTS
+
+# Upper probability bound of each segment but the last (Bajo <= 0.3 < Medio <= 0.7 < Alto)
+RISK_CUTOFFS = [0.3, 0.7]
+
+
+def _check_bands(cutoffs, labels):
+    cutoffs = np.asarray(cutoffs, dtype=float)
+    if np.any(np.diff(cutoffs) <= 0):
+        raise ValueError(f"Los cortes deben ser estrictamente crecientes: {list(cutoffs)}")
+    if len(labels) != len(cutoffs) + 1:
+        raise ValueError(f"Se necesitan {len(cutoffs) + 1} etiquetas para {len(cutoffs)} cortes, "
+                         f"no {len(labels)}.")
+    return cutoffs
+
+
+def band_codes(probabilities, cutoffs=RISK_CUTOFFS):
+    """Band index of each probability (-1 for missing values)."""
+    probabilities = np.asarray(probabilities, dtype=float)
+    codes = np.searchsorted(np.asarray(cutoffs, dtype=float), probabilities, side='left')
+    return np.where(np.isnan(probabilities), -1, codes)
+
+
+def assign_segments(probabilities, cutoffs=RISK_CUTOFFS, labels=RISK_SEGMENTS):
+    """Segment of each probability as an ordered categorical with ``labels``."""
+    cutoffs = _check_bands(cutoffs, labels)
+    return pd.Categorical.from_codes(band_codes(probabilities, cutoffs),
+                                     dtype=pd.CategoricalDtype(labels, ordered=True))
+
+
+def segment_profile(df, probability_col='Probabilidad_Churn', profile_cols=(),
+                    cutoffs=RISK_CUTOFFS, labels=RISK_SEGMENTS):
+    """Segments of ``df`` plus per-band counts and means in one pass.
+
+    Returns (segments, profile) where ``segments`` is the categorical
+    column and ``profile`` a DataFrame indexed by label with the columns
+    Clientes, Proporcion and the mean of each of ``profile_cols``.
+    """
+    cutoffs = _check_bands(cutoffs, labels)
+    codes = band_codes(df[probability_col], cutoffs)
+    segments = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(labels, ordered=True))
+
+    present = codes >= 0
+    codes = codes[present]
+    counts = np.bincount(codes, minlength=len(labels))
+    profile = {'Clientes': counts, 'Proporcion': counts / max(counts.sum(), 1)}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for col in profile_cols:
+            values = df[col].to_numpy(dtype=float)[present]
+            valid = ~np.isnan(values)
+            sums = np.bincount(codes[valid], weights=values[valid], minlength=len(labels))
+            profile[col] = sums / np.bincount(codes[valid], minlength=len(labels))
+    index = pd.CategoricalIndex(labels, dtype=segments.dtype, name='Segmento_Riesgo')
+    return segments, pd.DataFrame(profile, index=index)
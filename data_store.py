@@ -0,0 +1,347 @@
+"""Shared typed loader for the datasets in datos/.
+
+Every stage reads the same customer table at a different point of the
+pipeline. Instead of each script parsing its own CSV copy and guessing
+dtypes, they go through ``load_dataset``/``save_dataset``, which store a
+typed columnar copy (Parquet) and fall back to the CSV files when no
+Parquet engine is installed.
+
+Each dataset is stored once, with the column names of a single locale.
+Spanish and English names are views over that physical copy: the header
+translation comes from datos/column_mapping.csv and is applied with
+``localize`` when the data is loaded or rendered.
+"""
+import functools
+import os
+
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+MAPPING_PATH = os.path.join(DATA_DIR, 'column_mapping.csv')
+
+LOCALES = {'es': 'Spanish', 'en': 'English'}
+DEFAULT_LOCALE = 'es'
+
+# Logical datasets of the pipeline -> (file stem inside datos/, stored locale)
+DATASETS = {
+    'crudo': ('data_ecommerce_customer_churn', 'en'),
+    'limpio': ('dataset_ecommerce_limpio_es', 'es'),
+    'segmentado': ('dataset_ecommerce_segmentado_es', 'es'),
+}
+
+RISK_SEGMENTS = ['Bajo Riesgo', 'Riesgo Medio', 'Alto Riesgo']
+
+# Risk segment labels per locale, in the same order as RISK_SEGMENTS
+RISK_SEGMENT_LABELS = {
+    'es': RISK_SEGMENTS,
+    'en': ['Low Risk', 'Medium Risk', 'High Risk'],
+}
+
+# Declared schema (canonical Spanish names)
+SCHEMA = {
+    'Antiguedad': 'float64',
+    'Distancia_Almacen': 'float64',
+    'Numero_Dispositivos': 'int64',
+    'Categoria_Preferida': 'category',
+    'Nivel_Satisfaccion': 'int64',
+    'Estado_Civil': 'category',
+    'Numero_Direcciones': 'int64',
+    'Queja': 'int64',
+    'Dias_Ultima_Compra': 'float64',
+    'Monto_Cashback': 'float64',
+    'Target': 'int64',
+    'Probabilidad_Churn': 'float64',
+    'Segmento_Riesgo': pd.CategoricalDtype(RISK_SEGMENTS, ordered=True),
+}
+
+CATEGORICAL_COLUMNS = ['Categoria_Preferida', 'Estado_Civil', 'Segmento_Riesgo']
+
+# Parquet engines understood by pandas, in order of preference
+_PARQUET_ENGINES = ['pyarrow', 'fastparquet']
+
+
+def _parquet_engine():
+    """Return the first installed Parquet engine, or None to use CSV."""
+    for engine in _PARQUET_ENGINES:
+        try:
+            __import__(engine)
+        except ImportError:
+            continue
+        return engine
+    return None
+
+
+def _check_locale(locale):
+    if locale not in LOCALES:
+        raise ValueError(f"Idioma desconocido: {locale!r}. Opciones: {sorted(LOCALES)}")
+
+
+def _dataset(name):
+    """Return (file stem, stored locale) of a logical dataset."""
+    if name not in DATASETS:
+        raise KeyError(f"Dataset desconocido: {name!r}. Opciones: {sorted(DATASETS)}")
+    return DATASETS[name]
+
+
+@functools.lru_cache(maxsize=None)
+def column_mapping(source=DEFAULT_LOCALE, target='en'):
+    """Dict translating column names from ``source`` to ``target`` locale."""
+    _check_locale(source)
+    _check_locale(target)
+    mapping = pd.read_csv(MAPPING_PATH)
+    return dict(zip(mapping[LOCALES[source]], mapping[LOCALES[target]]))
+
+
+def translate_columns(columns, source=DEFAULT_LOCALE, target='en'):
+    """Translate a list of column names, leaving unknown names unchanged."""
+    mapping = column_mapping(source, target)
+    return [mapping.get(col, col) for col in columns]
+
+
+def schema(locale=DEFAULT_LOCALE):
+    """The declared schema with column names and segment labels in ``locale``."""
+    _check_locale(locale)
+    if locale == DEFAULT_LOCALE:
+        return dict(SCHEMA)
+    mapping = column_mapping(DEFAULT_LOCALE, locale)
+    translated = {mapping.get(col, col): dtype for col, dtype in SCHEMA.items()}
+    translated[mapping.get('Segmento_Riesgo', 'Segmento_Riesgo')] = pd.CategoricalDtype(
+        RISK_SEGMENT_LABELS[locale], ordered=True)
+    return translated
+
+
+def localize(df, locale, source=DEFAULT_LOCALE):
+    """View of ``df`` with column names and risk segment labels in ``locale``.
+
+    Only the column labels and the categories of the segment column are
+    replaced; the data buffers are shared with ``df``.
+    """
+    _check_locale(locale)
+    _check_locale(source)
+    if locale == source:
+        return df
+    view = df.copy(deep=False)
+    view.columns = translate_columns(df.columns, source, locale)
+    segment_col = column_mapping(DEFAULT_LOCALE, locale).get('Segmento_Riesgo', 'Segmento_Riesgo')
+    if segment_col in view.columns:
+        labels = dict(zip(RISK_SEGMENT_LABELS[source], RISK_SEGMENT_LABELS[locale]))
+        if isinstance(view[segment_col].dtype, pd.CategoricalDtype):
+            view[segment_col] = view[segment_col].cat.rename_categories(
+                lambda label: labels.get(label, label))
+        else:
+            view[segment_col] = view[segment_col].replace(labels)
+    return view
+
+
+def dataset_path(name, fmt='csv'):
+    """Path of a logical dataset in the given storage format."""
+    stem, _ = _dataset(name)
+    return os.path.join(DATA_DIR, f'{stem}.{fmt}')
+
+
+def apply_schema(df, locale=DEFAULT_LOCALE):
+    """Cast the columns of ``df`` that appear in the schema to their declared dtype."""
+    dtypes = {col: dtype for col, dtype in schema(locale).items() if col in df.columns}
+    return df.astype(dtypes)
+
+
+def _parquet_source(name):
+    """Engine to read the Parquet copy of ``name`` with, or None to read the CSV.
+
+    The Parquet copy is preferred unless the CSV is newer (e.g. it was
+    written by an environment without a Parquet engine).
+    """
+    engine = _parquet_engine()
+    parquet_path = dataset_path(name, 'parquet')
+    csv_path = dataset_path(name, 'csv')
+    if (engine is not None and os.path.exists(parquet_path)
+            and (not os.path.exists(csv_path)
+                 or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path))):
+        return engine
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    return None
+
+
+def source_path(name):
+    """Path of the file ``load_dataset(name)`` reads."""
+    return dataset_path(name, 'parquet' if _parquet_source(name) else 'csv')
+
+
+def storage_path(name):
+    """Path of the file ``save_dataset(df, name)`` writes."""
+    return dataset_path(name, 'parquet' if _parquet_engine() else 'csv')
+
+
+def _stored_columns(name, columns, locale):
+    _, stored_locale = _dataset(name)
+    _check_locale(locale)
+    if columns is None:
+        return stored_locale, None
+    return stored_locale, translate_columns(columns, locale, stored_locale)
+
+
+def _csv_dtypes(stored_locale, stored_columns):
+    return {col: dtype for col, dtype in schema(stored_locale).items()
+            if stored_columns is None or col in stored_columns}
+
+
+def load_dataset(name, columns=None, locale=DEFAULT_LOCALE):
+    """Load a logical dataset, reading only ``columns`` when given.
+
+    ``columns`` and the returned frame use the names of ``locale``,
+    whatever locale the dataset is stored in. The CSV fallback is parsed
+    with the declared dtypes. Raises FileNotFoundError when neither file
+    is present.
+    """
+    stored_locale, stored_columns = _stored_columns(name, columns, locale)
+    engine = _parquet_source(name)
+    if engine is not None:
+        df = pd.read_parquet(dataset_path(name, 'parquet'), columns=stored_columns, engine=engine)
+        df = apply_schema(df, stored_locale)
+    else:
+        df = pd.read_csv(dataset_path(name, 'csv'), usecols=stored_columns,
+                         dtype=_csv_dtypes(stored_locale, stored_columns))
+        if stored_columns is not None:
+            df = df[stored_columns]
+    return localize(df, locale, source=stored_locale)
+
+
+def _file_engine(path):
+    """Engine to read ``path`` with: a Parquet engine, or None for CSV."""
+    if not path.endswith('.parquet'):
+        return None
+    engine = _parquet_engine()
+    if engine is None:
+        raise ImportError(f"Se necesita pyarrow o fastparquet para leer {path}")
+    return engine
+
+
+def iter_file(path, chunksize, columns=None, locale=DEFAULT_LOCALE, source_locale=DEFAULT_LOCALE):
+    """Yield a CSV or Parquet file with ``source_locale`` column names in chunks.
+
+    Only one chunk of at most ``chunksize`` rows is held in memory at a
+    time. Schema columns get their declared dtypes; categorical columns
+    get the categories present in each chunk, so concatenating chunks may
+    need ``apply_schema`` again.
+    """
+    _check_locale(locale)
+    _check_locale(source_locale)
+    stored_columns = None if columns is None else translate_columns(columns, locale, source_locale)
+    engine = _file_engine(path)
+    if engine == 'pyarrow':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=stored_columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    elif engine == 'fastparquet':
+        import fastparquet
+        chunks = fastparquet.ParquetFile(path).iter_row_groups(columns=stored_columns)
+    else:
+        chunks = pd.read_csv(path, usecols=stored_columns,
+                             dtype=_csv_dtypes(source_locale, stored_columns),
+                             chunksize=chunksize)
+    for chunk in chunks:
+        if stored_columns is not None:
+            chunk = chunk[stored_columns]
+        yield localize(apply_schema(chunk, source_locale), locale, source=source_locale)
+
+
+def read_file(path, columns=None, locale=DEFAULT_LOCALE, source_locale=DEFAULT_LOCALE):
+    """Read a whole CSV or Parquet file (see ``iter_file``) into one typed frame."""
+    chunks = list(iter_file(path, 100_000, columns, locale, source_locale))
+    if not chunks:
+        raise ValueError(f"El archivo {path} está vacío.")
+    return apply_schema(pd.concat(chunks, ignore_index=True), locale)
+
+
+def iter_dataset(name, chunksize, columns=None, locale=DEFAULT_LOCALE):
+    """Yield a logical dataset as DataFrames of at most ``chunksize`` rows.
+
+    See ``iter_file``; the Parquet or CSV copy is chosen as in
+    ``load_dataset``.
+    """
+    _, stored_locale = _dataset(name)
+    path = dataset_path(name, 'parquet' if _parquet_source(name) else 'csv')
+    return iter_file(path, chunksize, columns, locale, source_locale=stored_locale)
+
+
+def save_dataset(df, name, locale=DEFAULT_LOCALE):
+    """Persist ``df`` (named in ``locale``) as the logical dataset ``name``.
+
+    The frame is translated to the dataset's stored locale, so only one
+    physical copy exists per dataset. Returns the path written.
+    """
+    _, stored_locale = _dataset(name)
+    df = apply_schema(localize(df, stored_locale, source=locale), stored_locale)
+    engine = _parquet_engine()
+    if engine is not None:
+        path = dataset_path(name, 'parquet')
+        df.to_parquet(path, index=False, engine=engine)
+    else:
+        path = dataset_path(name, 'csv')
+        df.to_csv(path, index=False)
+    return path
+
+
+class TableWriter:
+    """Write a CSV or Parquet file chunk by chunk, e.g. from ``iter_file``.
+
+    Use as a context manager; a previous file is replaced. Chunks are
+    named in ``locale`` and written with ``stored_locale`` column names.
+    Categorical columns are stored as plain values because the categories
+    of each chunk differ; the loaders restore the declared dtypes.
+    """
+
+    def __init__(self, path, stored_locale=DEFAULT_LOCALE, locale=DEFAULT_LOCALE):
+        _check_locale(stored_locale)
+        _check_locale(locale)
+        self.path = path
+        self.stored_locale = stored_locale
+        self.locale = locale
+        self.engine = _file_engine(path)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, chunk):
+        chunk = localize(chunk, self.stored_locale, source=self.locale)
+        dtypes = {col: dtype for col, dtype in schema(self.stored_locale).items()
+                  if col in chunk.columns}
+        chunk = chunk.astype({col: (object if isinstance(dtype, pd.CategoricalDtype) or dtype == 'category'
+                                    else dtype) for col, dtype in dtypes.items()})
+        if self.engine == 'pyarrow':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        elif self.engine == 'fastparquet':
+            import fastparquet
+            fastparquet.write(self.path, chunk, write_index=False, append=self.rows > 0)
+        else:
+            chunk.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class DatasetWriter(TableWriter):
+    """Write a logical dataset chunk by chunk, e.g. from ``iter_dataset``.
+
+    Parquet is used when an engine is installed, CSV otherwise.
+    """
+
+    def __init__(self, name, locale=DEFAULT_LOCALE):
+        _, stored_locale = _dataset(name)
+        super().__init__(storage_path(name), stored_locale, locale)
@@ -0,0 +1,185 @@
+"""Binary classification metrics from one sort of the scores.
+
+``ScoreCurve`` reduces (target, score) pairs to the number of positives
+and negatives at each distinct score. Sweeping the distinct scores from
+the highest down, cumulative sums give the true/false positive counts of
+every cutoff at once: ROC AUC, PR AUC (average precision) and the
+precision/recall/F1/confusion curve over all thresholds come from those
+counts without scanning the predictions again. States built on separate
+chunks (or in separate processes, ``evaluate_chunks``) merge exactly, so
+score files larger than memory can be evaluated; the state grows with the
+number of distinct scores, not rows (``decimals`` bounds it).
+
+A row is predicted positive at threshold ``t`` when its score is ``> t``,
+as with ``predict`` at 0.5 and the risk cutoffs of segments.py.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+class ScoreCurve:
+    """Mergeable counts of positives and negatives per distinct score."""
+
+    def __init__(self, decimals=None):
+        self.decimals = decimals
+        self.scores = np.empty(0)
+        self.positives = np.empty(0, dtype=np.int64)
+        self.negatives = np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_scores(cls, y_true, y_score, decimals=None):
+        return cls(decimals).update(y_true, y_score)
+
+    @staticmethod
+    def _collapse(scores, positives, totals):
+        # The one sort: distinct scores ascending, counts summed per score
+        distinct, inverse = np.unique(scores, return_inverse=True)
+        positives = np.bincount(inverse, weights=positives, minlength=distinct.size).astype(np.int64)
+        totals = np.bincount(inverse, weights=totals, minlength=distinct.size).astype(np.int64)
+        return distinct, positives, totals - positives
+
+    def update(self, y_true, y_score):
+        """Add a chunk of 0/1 targets and their scores."""
+        y_true = np.asarray(y_true).ravel()
+        y_score = np.asarray(y_score, dtype=float).ravel()
+        if y_true.shape != y_score.shape:
+            raise ValueError(f"Target y puntuaciones con distinto número de filas: {y_true.size} y {y_score.size}")
+        if np.isnan(y_score).any():
+            raise ValueError("Hay puntuaciones vacías (NaN).")
+        if not np.isin(y_true, [0, 1]).all():
+            raise ValueError("El target debe ser binario (0/1).")
+        if self.decimals is not None:
+            y_score = np.round(y_score, self.decimals)
+        scores = np.concatenate([self.scores, y_score])
+        positives = np.concatenate([self.positives, y_true.astype(np.int64)])
+        totals = np.concatenate([self.positives + self.negatives, np.ones(y_true.size, dtype=np.int64)])
+        self.scores, self.positives, self.negatives = self._collapse(scores, positives, totals)
+        return self
+
+    def merge(self, other):
+        """Fold the counts of ``other`` into this curve."""
+        self.scores, self.positives, self.negatives = self._collapse(
+            np.concatenate([self.scores, other.scores]),
+            np.concatenate([self.positives, other.positives]),
+            np.concatenate([self.positives + self.negatives, other.positives + other.negatives]))
+        return self
+
+    @property
+    def n_positives(self):
+        return int(self.positives.sum())
+
+    @property
+    def n_negatives(self):
+        return int(self.negatives.sum())
+
+    def _check(self):
+        if self.n_positives == 0 or self.n_negatives == 0:
+            raise ValueError("Se necesitan ejemplos de ambas clases para evaluar.")
+
+    def _cumulative(self):
+        """Thresholds from the highest score down with their TP and FP counts."""
+        # Threshold i is the next lower distinct score, so that exactly the
+        # i + 1 highest distinct scores are above it
+        thresholds = np.append(self.scores[-2::-1], np.nextafter(self.scores[0], -np.inf))
+        return thresholds, np.cumsum(self.positives[::-1]), np.cumsum(self.negatives[::-1])
+
+    def roc_auc(self):
+        """Area under the ROC curve (trapezoids; ties count as half)."""
+        self._check()
+        _, tp, fp = self._cumulative()
+        tpr = np.concatenate([[0], tp]) / self.n_positives
+        fpr = np.concatenate([[0], fp]) / self.n_negatives
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+
+    def pr_auc(self):
+        """Area under the precision-recall curve as average precision."""
+        self._check()
+        _, tp, fp = self._cumulative()
+        recall = np.concatenate([[0], tp]) / self.n_positives
+        return float(np.sum(np.diff(recall) * tp / (tp + fp)))
+
+    def curve(self):
+        """Confusion counts, precision, recall, F1 and accuracy at every threshold."""
+        self._check()
+        thresholds, tp, fp = self._cumulative()
+        fn = self.n_positives - tp
+        tn = self.n_negatives - fp
+        precision = tp / (tp + fp)
+        recall = tp / self.n_positives
+        with np.errstate(invalid='ignore'):
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        return pd.DataFrame({
+            'Umbral': thresholds, 'TP': tp, 'FP': fp, 'FN': fn, 'TN': tn,
+            'Precision': precision, 'Recall': recall, 'F1 Score': f1,
+            'FPR': fp / self.n_negatives, 'Accuracy': (tp + tn) / (self.n_positives + self.n_negatives),
+        })
+
+    def at(self, thresholds):
+        """Rows of ``curve()`` for arbitrary ``thresholds``."""
+        thresholds = np.asarray(thresholds, dtype=float)
+        curve = self.curve()
+        # Row i of the curve predicts positive the i + 1 highest distinct scores
+        n_above = self.scores.size - np.searchsorted(self.scores, thresholds, side='right')
+        rows = curve.iloc[np.maximum(n_above - 1, 0)].reset_index(drop=True)
+        empty = n_above == 0
+        rows.loc[empty, ['TP', 'FP', 'Precision', 'Recall', 'F1 Score', 'FPR']] = 0
+        rows.loc[empty, 'FN'] = self.n_positives
+        rows.loc[empty, 'TN'] = self.n_negatives
+        rows.loc[empty, 'Accuracy'] = self.n_negatives / (self.n_positives + self.n_negatives)
+        return rows.assign(Umbral=thresholds)
+
+    def confusion(self, threshold=0.5):
+        """Confusion matrix [[TN, FP], [FN, TP]] at ``threshold``."""
+        # Distinct scores > threshold are the predicted positives
+        start = np.searchsorted(self.scores, threshold, side='right')
+        tp = int(self.positives[start:].sum())
+        fp = int(self.negatives[start:].sum())
+        return np.array([[self.n_negatives - fp, fp], [self.n_positives - tp, tp]])
+
+    def metrics(self, threshold=0.5):
+        """Accuracy, precision, recall and F1 at ``threshold``, plus ROC AUC and PR AUC."""
+        (tn, fp), (fn, tp) = self.confusion(threshold)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        return {
+            'Accuracy': (tp + tn) / (tp + tn + fp + fn),
+            'Precision': precision,
+            'Recall': recall,
+            'F1 Score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'ROC AUC': self.roc_auc(),
+            'PR AUC': self.pr_auc(),
+        }
+
+    def best_threshold(self, metric='F1 Score'):
+        """Row of ``curve()`` that maximizes ``metric``."""
+        curve = self.curve()
+        return curve.loc[curve[metric].idxmax()]
+
+
+def _curve_chunk(chunk, target, score, decimals):
+    return ScoreCurve(decimals).update(chunk[target], chunk[score])
+
+
+def evaluate_chunks(chunks, target='Target', score='Probabilidad_Churn', n_jobs=1, decimals=None):
+    """``ScoreCurve`` of an iterable of DataFrame chunks, optionally across processes.
+
+    As in ``streaming_stats.profile_chunks``, at most ``2 * n_jobs`` chunks
+    are in flight, so memory stays bounded by the chunk size.
+    """
+    curve = ScoreCurve(decimals)
+    if n_jobs <= 1:
+        for chunk in chunks:
+            curve.update(chunk[target], chunk[score])
+        return curve
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_curve_chunk, chunk[[target, score]], target, score, decimals))
+            if len(pending) >= 2 * n_jobs:
+                curve.merge(pending.pop(0).result())
+        for future in pending:
+            curve.merge(future.result())
+    return curve
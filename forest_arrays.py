@@ -0,0 +1,289 @@
+"""Random Forest compiled into flat node arrays.
+
+Unpickling a fitted forest copies every tree into the process, and its
+``predict_proba`` pays the ColumnTransformer and per-tree dispatch on
+every call. Here the nodes of all trees are concatenated into a few
+arrays (children, input column, threshold, leaf probability) and all
+trees are evaluated over a batch at once with NumPy.
+
+The preprocessing is fused into the nodes, so raw rows are scored
+directly: a split on a standardized column becomes a split on the raw
+value (the largest raw value whose scaled float32 value goes left, see
+``raw_thresholds``), and the one-hot encoding is reduced to one
+indicator column per category, built from the category codes. Unknown
+categories get no indicator, like ``OneHotEncoder(handle_unknown='ignore')``.
+A missing numeric value takes the branch scikit-learn sends it to at each
+node (``tree_.missing_go_to_left``).
+
+Exported as .npy files, the arrays can be opened with
+``np.load(mmap_mode='r')`` by several worker processes, which then share
+one copy of the model through the OS page cache.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from model_registry import artifact_dir, load_metadata, load_model
+
+ARRAYS = ['children', 'column', 'threshold', 'missing_right', 'proba', 'roots']
+
+# Bumped when the exported layout changes; older exports are rebuilt
+FORMAT_VERSION = 3
+
+
+def _scaled32(x, mean, scale):
+    # What a tree compares: StandardScaler output cast to float32
+    return ((x - mean) / scale).astype(np.float32)
+
+
+def raw_thresholds(threshold, mean, scale):
+    """Raw-space thresholds equivalent to splits on standardized columns.
+
+    For each node, the largest float64 ``x`` with
+    ``float32((x - mean) / scale) <= threshold``, so ``x <= result`` takes
+    the same branch as the tree on the scaled value, bit for bit.
+    """
+    # float32(y) <= threshold iff y rounds to at most the largest float32
+    # below the threshold, i.e. y is below the midpoint between it and the
+    # next float32 (exact in float64)
+    below = threshold.astype(np.float32)
+    below = np.where(below > threshold, np.nextafter(below, np.float32(-np.inf)), below)
+    midpoint = (below.astype(np.float64) + np.nextafter(below, np.float32(np.inf))) / 2
+    raw = midpoint * scale + mean
+    # Rounding of x -> y leaves the estimate a few float64 ulps from the
+    # boundary: step down while it is right of it, then up while the next
+    # value is still left
+    for direction in (-np.inf, np.inf):
+        while True:
+            if direction < 0:
+                move = _scaled32(raw, mean, scale) > threshold
+                candidate = np.nextafter(raw, direction)
+            else:
+                candidate = np.nextafter(raw, direction)
+                move = _scaled32(candidate, mean, scale) <= threshold
+            if not move.any():
+                break
+            raw = np.where(move, candidate, raw)
+    return raw
+
+
+def is_compilable(pipeline):
+    """Whether ``pipeline`` is the shared preprocessor followed by a Random Forest."""
+    steps = getattr(pipeline, 'named_steps', {})
+    preprocessor = steps.get('preprocessor')
+    if not (isinstance(preprocessor, ColumnTransformer)
+            and isinstance(steps.get('classifier'), RandomForestClassifier)):
+        return False
+    transformers = getattr(preprocessor, 'named_transformers_', {})
+    return (isinstance(transformers.get('num'), StandardScaler)
+            and isinstance(transformers.get('cat'), OneHotEncoder))
+
+
+def compile_forest(pipeline):
+    """Node arrays and input encoding of ``pipeline`` (preprocessor + forest).
+
+    The input columns are the raw numerical columns followed by one
+    indicator per category, in the order of the fitted preprocessor, so
+    node columns are the transformed feature indices. Returns (arrays,
+    meta) where ``meta`` describes those columns. Raises ValueError for
+    any other kind of pipeline (see ``is_compilable``).
+    """
+    if not is_compilable(pipeline):
+        raise ValueError("Solo se puede compilar un Random Forest con el preprocesamiento compartido "
+                         "(ColumnTransformer + RandomForestClassifier).")
+    preprocessor = pipeline.named_steps['preprocessor']
+    forest = pipeline.named_steps['classifier']
+    scaler = preprocessor.named_transformers_['num']
+    encoder = preprocessor.named_transformers_['cat']
+    numerical_cols = list(preprocessor.transformers_[0][2])
+    categorical_cols = list(preprocessor.transformers_[1][2])
+
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    left = np.concatenate([tree.children_left for tree in trees]).astype(np.int64)
+    right = np.concatenate([tree.children_right for tree in trees]).astype(np.int64)
+    is_leaf = left == -1
+    # Children are global node indices, interleaved (left of node i at 2i,
+    # right at 2i + 1); a leaf child is stored as ~index so the scorer
+    # recognizes it by its sign without another lookup
+    tree_offsets = np.repeat(offsets, sizes)
+    children = np.stack([left + tree_offsets, right + tree_offsets], axis=1)
+    children[is_leaf] = 0
+    children = np.where(is_leaf[children], ~children, children)
+    children[is_leaf] = -1
+    roots = np.where(is_leaf[offsets], ~offsets, offsets)
+    # Leaf values are class fractions; keep the positive class
+    values = np.concatenate([tree.value[:, 0, :] for tree in trees])
+    positive = list(forest.classes_).index(1)
+    proba = values[:, positive] / values.sum(axis=1)
+
+    # Fuse the scaler into the numeric splits; indicator splits keep 0.5
+    column = np.concatenate([tree.feature for tree in trees]).clip(min=0)
+    threshold = np.concatenate([tree.threshold for tree in trees])
+    numeric = ~is_leaf & (column < len(numerical_cols))
+    scaled = column[numeric]
+    threshold[numeric] = raw_thresholds(threshold[numeric], scaler.mean_[scaled], scaler.scale_[scaled])
+
+    # Branch of a missing value at each node, as the child offset (0 left, 1 right)
+    missing_right = ~np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool)
+
+    arrays = {
+        'children': children.ravel(),
+        'column': column.astype(np.int64),
+        'threshold': threshold,
+        'missing_right': missing_right,
+        'proba': proba,
+        'roots': roots.astype(np.int64),
+    }
+    meta = {
+        'format': FORMAT_VERSION,
+        'n_trees': len(trees),
+        'max_depth': int(max(tree.max_depth for tree in trees)),
+        'n_nodes': int(left.size),
+        'features': list(pipeline.feature_names_in_),
+        'numerical': numerical_cols,
+        'categorical': {col: [str(c) for c in categories]
+                        for col, categories in zip(categorical_cols, encoder.categories_)},
+    }
+    return arrays, meta
+
+
+def export_forest(pipeline, directory):
+    """Write the compiled arrays of ``pipeline`` to ``directory``."""
+    arrays, meta = compile_forest(pipeline)
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(directory, 'forest.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return directory
+
+
+def _export_format(directory):
+    path = os.path.join(directory, 'forest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('format')
+
+
+def registry_forest(name, key=None):
+    """Directory of the exported arrays of a registered forest pipeline.
+
+    The arrays are exported next to the artifact the first time. Raises
+    ValueError when the artifact is not a compilable forest.
+    """
+    metadata = load_metadata(name, key=key)
+    directory = os.path.join(artifact_dir(name, metadata['key']), 'forest')
+    if _export_format(directory) != FORMAT_VERSION:
+        pipeline, _ = load_model(name, key=metadata['key'])
+        export_forest(pipeline, directory)
+    return directory
+
+
+class ForestScorer:
+    """Churn probabilities of raw rows from a compiled forest.
+
+    Built from an exported directory (``mmap_mode='r'``, the default, maps
+    the node arrays instead of reading them) or in memory with
+    ``from_pipeline``. Predictions match the pipeline's
+    ``predict_proba(X)[:, 1]`` exactly; see ``check_parity``.
+    """
+
+    def __init__(self, directory=None, mmap_mode='r', batch_size=2_000, arrays=None, meta=None):
+        if directory is not None:
+            with open(os.path.join(directory, 'forest.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                      for name in ARRAYS}
+        self.meta = meta
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.features = meta['features']
+        self.numerical = meta['numerical']
+        self.categories = {col: pd.Index(categories) for col, categories in meta['categorical'].items()}
+        self.n_columns = len(self.numerical) + sum(len(c) for c in self.categories.values())
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_pipeline(cls, pipeline, batch_size=2_000):
+        """In-memory scorer compiled from a fitted pipeline."""
+        arrays, meta = compile_forest(pipeline)
+        return cls(arrays=arrays, meta=meta, batch_size=batch_size)
+
+    def encode(self, X):
+        """Column-major input matrix (n_columns, n_rows) of the raw frame ``X``.
+
+        Numerical columns as they are, then one 0/1 indicator per category.
+        """
+        Z = np.zeros((self.n_columns, len(X)))
+        for i, col in enumerate(self.numerical):
+            Z[i] = X[col].to_numpy(dtype=np.float64)
+        start = len(self.numerical)
+        for col, categories in self.categories.items():
+            codes = categories.get_indexer(X[col].astype(str))
+            known = np.flatnonzero(codes >= 0)
+            Z[start + codes[known], known] = 1.0
+            start += len(categories)
+        return Z
+
+    def _predict_encoded(self, Z):
+        n_rows = Z.shape[1]
+        values = np.ascontiguousarray(Z).ravel()
+        n_trees = len(self.roots)
+        # One (tree, row) pair per position, tree-major. Only the pairs that
+        # have not reached a leaf are kept, with their row and position
+        nodes = np.repeat(np.asarray(self.roots), n_rows)
+        rows = np.tile(np.arange(n_rows), n_trees)
+        positions = np.arange(nodes.size)
+        proba = np.empty(nodes.size)
+        column_offsets = np.asarray(self.column) * n_rows
+        while nodes.size:
+            done = nodes < 0
+            proba[positions[done]] = self.proba[~nodes[done]]
+            active = ~done
+            nodes, rows, positions = nodes[active], rows[active], positions[active]
+            value = values[column_offsets[nodes] + rows]
+            go_right = np.where(np.isnan(value), self.missing_right[nodes], value > self.threshold[nodes])
+            nodes = self.children[2 * nodes + go_right]
+        return proba.reshape(n_trees, n_rows).mean(axis=0)
+
+    def predict_proba(self, X):
+        """Probability of churn for each row of the raw feature frame ``X``."""
+        if not len(X):
+            return np.empty(0)
+        Z = self.encode(X)
+        return np.concatenate([self._predict_encoded(Z[:, start:start + self.batch_size])
+                               for start in range(0, Z.shape[1], self.batch_size)])
+
+
+def with_missing(X, numerical, fraction=0.2, random_state=0):
+    """``X`` plus a copy of its rows with ``fraction`` of the ``numerical`` cells missing."""
+    rng = np.random.default_rng(random_state)
+    holes = X.copy()
+    for col in numerical:
+        holes[col] = holes[col].astype(np.float64).mask(rng.random(len(holes)) < fraction)
+    return pd.concat([X, holes], ignore_index=True)
+
+
+def check_parity(pipeline, scorer, X, tolerance=1e-9):
+    """Max absolute difference between ``scorer`` and ``pipeline`` on ``X``.
+
+    The rows of ``X`` are also checked with missing numeric values
+    (``with_missing``). Raises ValueError when the difference exceeds
+    ``tolerance``.
+    """
+    X = with_missing(X, scorer.numerical)
+    expected = pipeline.predict_proba(X[scorer.features])[:, 1]
+    difference = float(np.max(np.abs(scorer.predict_proba(X) - expected), initial=0.0))
+    if difference > tolerance:
+        raise ValueError(f"El bosque compilado difiere de scikit-learn en {difference:.3g} "
+                         f"(tolerancia {tolerance:g})")
+    return difference
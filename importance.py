@@ -0,0 +1,131 @@
+"""Permutation importance of a registered model, cached with the artifact.
+
+The importance of an original column (before one-hot encoding) is the
+drop in ROC AUC when its values are shuffled across the evaluation rows,
+averaged over ``n_repeats`` shuffles. It is measured with the model's
+recipe fitted on the training rows only: the registered artifact is
+usually fitted on the full dataset and has already seen the evaluation
+rows. Every (column, repeat) pair is an independent job: the workers of a
+process pool load the fitted model and the evaluation frame once and only
+receive the column and the repeat, and each shuffle is seeded by
+(random_state, column, repeat), so the result does not depend on
+``n_jobs``.
+
+The result is written to importance.json next to the model artifact
+(modelos/<name>/<key>/) together with the hash of the evaluation data and
+the settings, and copied to modelos/<name>/importance.json, so the
+dashboards read the last importances computed under a name without
+touching the model (``load_importance``). It is only recomputed when the
+data or the settings change.
+"""
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from evaluation import ScoreCurve
+from model_registry import CHURN_MODEL, artifact_dir, data_hash, model_dir
+
+IMPORTANCE_FILE = 'importance.json'
+
+# Model and evaluation rows of each worker process, set by _init_worker
+_state = {}
+
+
+def importance_path(name, key=None):
+    """importance.json of an artifact, or the last one computed under ``name``."""
+    return os.path.join(artifact_dir(name, key) if key else model_dir(name), IMPORTANCE_FILE)
+
+
+def _init_worker(data_path):
+    pipeline, X, y = joblib.load(data_path)
+    _state.update(pipeline=pipeline, X=X, y=y)
+
+
+def _auc(X):
+    return ScoreCurve.from_scores(_state['y'], _state['pipeline'].predict_proba(X)[:, 1]).roc_auc()
+
+
+def _permuted_auc(column, repeat, random_state):
+    X = _state['X']
+    rng = np.random.default_rng([random_state, X.columns.get_loc(column), repeat])
+    # Reorder the Series itself so categorical dtypes survive the shuffle
+    shuffled = X[column].iloc[rng.permutation(len(X))].set_axis(X.index)
+    return _auc(X.assign(**{column: shuffled}))
+
+
+def permutation_importance(pipeline, X, y, n_repeats=5, n_jobs=1, random_state=42):
+    """ROC AUC drop per column of ``X`` for a fitted pipeline.
+
+    ``pipeline`` must not have been fitted on the rows of ``X``. Returns
+    (DataFrame indexed by column with the mean drop in ``Importancia`` and
+    its standard deviation in ``Desviacion``, sorted by importance; ROC AUC
+    without shuffling).
+    """
+    X = X[list(pipeline.feature_names_in_)]
+    y = np.asarray(y)
+    _state.update(pipeline=pipeline, X=X, y=y)
+    baseline = _auc(X)
+    jobs = [(column, repeat) for column in X.columns for repeat in range(n_repeats)]
+    if n_jobs <= 1:
+        scores = [_permuted_auc(column, repeat, random_state) for column, repeat in jobs]
+    else:
+        with tempfile.TemporaryDirectory(prefix='importance_') as directory:
+            data_path = os.path.join(directory, 'data.joblib')
+            joblib.dump((pipeline, X, y), data_path)
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(data_path,)) as pool:
+                futures = [pool.submit(_permuted_auc, column, repeat, random_state) for column, repeat in jobs]
+                scores = [future.result() for future in futures]
+    _state.clear()
+    drops = baseline - np.array(scores).reshape(len(X.columns), n_repeats)
+    result = pd.DataFrame({'Importancia': drops.mean(axis=1), 'Desviacion': drops.std(axis=1)},
+                          index=pd.Index(X.columns, name='Variable'))
+    return result.sort_values('Importancia', ascending=False), baseline
+
+
+def load_importance(name=CHURN_MODEL, key=None):
+    """Cached importances of an artifact.
+
+    Without ``key``, the last importances computed under ``name``: the
+    latest artifact may have none yet (e.g. after Modeling/forest_refresh.py).
+    Raises FileNotFoundError when they have not been computed.
+    """
+    with open(importance_path(name, key), encoding='utf-8') as f:
+        stored = json.load(f)
+    result = pd.DataFrame(stored['importances']).T
+    result.index.name = 'Variable'
+    return result.sort_values('Importancia', ascending=False)
+
+
+def cached_importance(name, key, fit, X, y, n_repeats=5, n_jobs=1, random_state=42):
+    """Importances of (name, key) on (X, y), read from the cache when valid.
+
+    ``fit`` is called without arguments on a cache miss and returns the
+    artifact's recipe fitted without the rows of ``X`` (as ``train`` in
+    model_registry.load_or_train). Returns (importances, metadata of the
+    computation, loaded).
+    """
+    settings = {'key': key, 'data': data_hash(X.assign(Target=np.asarray(y))), 'n_repeats': n_repeats,
+                'random_state': random_state, 'metric': 'ROC AUC', 'model': 'holdout'}
+    path = importance_path(name, key)
+    stored = None
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            stored = json.load(f)
+    loaded = stored is not None and all(stored.get(field) == value for field, value in settings.items())
+    if not loaded:
+        start = time.perf_counter()
+        importances, baseline = permutation_importance(fit(), X, y, n_repeats, n_jobs, random_state)
+        stored = {**settings, 'baseline': baseline, 'rows': len(X), 'seconds': time.perf_counter() - start,
+                  'importances': importances.to_dict(orient='index')}
+    # The artifact's cache and the name's last importances (load_importance)
+    for target in (path, importance_path(name)):
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, ensure_ascii=False)
+    return load_importance(name, key), stored, loaded
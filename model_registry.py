@@ -0,0 +1,175 @@
+"""Local registry of fitted model pipelines.
+
+Each artifact is stored under modelos/<name>/<key>/ as a joblib pickle of
+the fitted Pipeline plus a metadata.json (metrics, feature importances,
+training time, library versions). The key is a content hash of the
+training data, the model parameters and a recipe version, so a consumer
+that knows those three things loads the exact model it would have trained
+instead of training it again. modelos/<name>/latest.json points to the
+last artifact saved under that name.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from preprocessing import feature_names, fit_transform
+
+REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos')
+
+# Production churn model, trained by Modeling/ and used by Segmentation/
+# and the dashboards. Bump the version when the training recipe changes.
+CHURN_MODEL = 'random_forest'
+CHURN_MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42}
+CHURN_MODEL_VERSION = 1
+
+
+def data_hash(df):
+    """Content hash of a DataFrame (values and column names, not the index)."""
+    return chunked_data_hash([df])
+
+
+def chunked_data_hash(chunks):
+    """``data_hash`` of the concatenation of ``chunks``, one chunk at a time."""
+    digest = None
+    for chunk in chunks:
+        if digest is None:
+            digest = hashlib.sha256()
+            digest.update(json.dumps([str(col) for col in chunk.columns]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def artifact_key(data_digest, params, version):
+    """Registry key of a model trained on ``data_digest`` with ``params``."""
+    payload = {'data': data_digest, 'params': params, 'version': version,
+               'sklearn': sklearn.__version__}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def model_dir(name):
+    return os.path.join(REGISTRY_DIR, name)
+
+
+def artifact_dir(name, key):
+    return os.path.join(model_dir(name), key)
+
+
+def save_model(name, model, data_digest, params, version, metrics=None,
+               feature_importances=None, training_time=None):
+    """Store a fitted pipeline and its metadata; returns the metadata."""
+    key = artifact_key(data_digest, params, version)
+    directory = artifact_dir(name, key)
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(model, os.path.join(directory, 'model.joblib'))
+    metadata = {
+        'name': name,
+        'key': key,
+        'version': version,
+        'params': params,
+        'data_hash': data_digest,
+        'sklearn_version': sklearn.__version__,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'training_time': training_time,
+        'metrics': metrics or {},
+        'feature_importances': feature_importances or {},
+    }
+    with open(os.path.join(directory, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    with open(os.path.join(REGISTRY_DIR, name, 'latest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'key': key}, f)
+    return metadata
+
+
+def _resolve_key(name, data_digest, params, version, key):
+    if key is not None:
+        return key
+    if data_digest is not None:
+        return artifact_key(data_digest, params, version)
+    latest = os.path.join(REGISTRY_DIR, name, 'latest.json')
+    if not os.path.exists(latest):
+        raise FileNotFoundError(latest)
+    with open(latest, encoding='utf-8') as f:
+        return json.load(f)['key']
+
+
+def load_metadata(name, data_digest=None, params=None, version=None, key=None):
+    """Metadata of an artifact (the latest one when no key or data hash is given)."""
+    path = os.path.join(artifact_dir(name, _resolve_key(name, data_digest, params, version, key)),
+                        'metadata.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_model(name, data_digest=None, params=None, version=None, key=None):
+    """Load (fitted pipeline, metadata) from the registry.
+
+    With ``data_digest``, ``params`` and ``version`` (or directly ``key``)
+    the exact artifact for that training run is loaded; without them, the
+    latest one saved under ``name``. Raises FileNotFoundError when it is
+    not registered.
+    """
+    metadata = load_metadata(name, data_digest, params, version, key)
+    model = joblib.load(os.path.join(artifact_dir(name, metadata['key']), 'model.joblib'))
+    return model, metadata
+
+
+def update_metadata(name, key, **fields):
+    """Overwrite metadata fields (e.g. metrics) of a registered artifact."""
+    path = os.path.join(artifact_dir(name, key), 'metadata.json')
+    with open(path, encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata.update(fields)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    return metadata
+
+
+def load_or_train(name, train, data_digest, params, version):
+    """Load the artifact for (data, params, version) or train and register it.
+
+    ``train`` is called without arguments on a registry miss and returns
+    (fitted pipeline, metadata keyword arguments for ``save_model``).
+    Returns (pipeline, metadata, loaded) where ``loaded`` tells whether
+    training was skipped.
+    """
+    try:
+        model, metadata = load_model(name, data_digest, params, version)
+        return model, metadata, True
+    except FileNotFoundError:
+        pass
+    start = time.perf_counter()
+    model, extra = train()
+    extra.setdefault('training_time', time.perf_counter() - start)
+    metadata = save_model(name, model, data_digest, params, version, **extra)
+    return model, metadata, False
+
+
+def fit_churn_model(X, y, params=CHURN_MODEL_PARAMS):
+    """Fit the production churn pipeline on the full dataset.
+
+    ``params`` are the RandomForestClassifier parameters (the production
+    ones by default). Returns (fitted Pipeline, metadata keyword
+    arguments) as expected by ``load_or_train``.
+    """
+    preprocessor, X_t, _ = fit_transform(X)
+    classifier = RandomForestClassifier(**params).fit(X_t, y)
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+    importances = dict(zip(feature_names(preprocessor), classifier.feature_importances_.tolist()))
+    return pipeline, {'feature_importances': importances}
+
+
+def load_churn_model(df, target='Target'):
+    """Registered churn pipeline for ``df`` (trained and saved on a miss).
+
+    Returns (pipeline, metadata, loaded).
+    """
+    return load_or_train(CHURN_MODEL, lambda: fit_churn_model(df.drop(target, axis=1), df[target]),
+                         data_hash(df), CHURN_MODEL_PARAMS, CHURN_MODEL_VERSION)
@@ -0,0 +1,131 @@
+"""Shared, disk-cached preprocessing for the modeling stages.
+
+Every model of the pipeline uses the same ColumnTransformer (StandardScaler
+on the numeric columns, OneHotEncoder on the categorical ones). Instead of
+refitting it inside a Pipeline for each candidate model, it is fitted once
+per split and the transformed matrices are reused by all models. The
+result is memoized on disk with joblib.Memory, keyed by the content of the
+data, so a rerun on unchanged data skips the preprocessing altogether.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Memory
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pipeline_cache', 'preprocessing')
+
+memory = Memory(CACHE_DIR, verbose=0)
+
+
+def feature_columns(X):
+    """(numerical columns, categorical columns) of a feature frame."""
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    return numerical_cols, categorical_cols
+
+
+def build_preprocessor(numerical_cols, categorical_cols):
+    """Unfitted ColumnTransformer used by every model."""
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numerical_cols),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_cols)
+        ])
+
+
+def feature_names(preprocessor):
+    """Names of the transformed columns (numeric first, then one-hot)."""
+    numerical_cols = preprocessor.transformers_[0][2]
+    categorical_cols = preprocessor.transformers_[1][2]
+    onehot = preprocessor.named_transformers_['cat'].get_feature_names_out(categorical_cols)
+    return list(numerical_cols) + list(onehot)
+
+
+@memory.cache
+def _fit_transform(X, X_other, sklearn_version):
+    # sklearn_version is only part of the cache key: a pickled transformer
+    # is not reused across scikit-learn versions
+    preprocessor = build_preprocessor(*feature_columns(X))
+    X_t = preprocessor.fit_transform(X)
+    X_other_t = preprocessor.transform(X_other) if X_other is not None else None
+    return preprocessor, X_t, X_other_t
+
+
+def fit_transform(X, X_other=None):
+    """Fit the preprocessor on ``X`` and transform ``X`` (and ``X_other``).
+
+    Returns (fitted preprocessor, transformed X, transformed X_other or
+    None). Cached on disk by the content of the inputs.
+    """
+    return _fit_transform(X, X_other, sklearn.__version__)
+
+
+def raw_split(X, y, test_size=0.2, random_state=42):
+    """Stratified train/test split of the raw frames (same rows as ``preprocessed_split``).
+
+    Returns (X_train, X_test, y_train, y_test).
+    """
+    return train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+
+
+def preprocessed_split(X, y, test_size=0.2, random_state=42):
+    """Stratified train/test split with the preprocessing fitted on train.
+
+    Returns (preprocessor, X_train_t, X_test_t, y_train, y_test).
+    """
+    X_train, X_test, y_train, y_test = raw_split(X, y, test_size, random_state)
+    preprocessor, X_train_t, X_test_t = fit_transform(X_train, X_test)
+    return preprocessor, X_train_t, X_test_t, y_train, y_test
+
+
+class StreamingPreprocessor(TransformerMixin, BaseEstimator):
+    """The shared preprocessing, fitted chunk by chunk with ``partial_fit``.
+
+    Same output layout as ``build_preprocessor``: standardized numeric
+    columns, then one indicator per category (sorted, unknown categories
+    get none). The scaler keeps running moments and the categories seen so
+    far are accumulated, so data larger than memory can be fitted in one
+    pass over its chunks.
+    """
+
+    def __init__(self, numerical_cols, categorical_cols):
+        self.numerical_cols = numerical_cols
+        self.categorical_cols = categorical_cols
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, 'scaler_'):
+            self.scaler_ = StandardScaler()
+            self.seen_ = {col: set() for col in self.categorical_cols}
+            self.feature_names_in_ = np.asarray(list(X.columns), dtype=object)
+        self.scaler_.partial_fit(X[self.numerical_cols])
+        for col in self.categorical_cols:
+            self.seen_[col].update(X[col].dropna().astype(str).unique())
+        self.categories_ = {col: sorted(values) for col, values in self.seen_.items()}
+        return self
+
+    def fit(self, X, y=None):
+        for attribute in ('scaler_', 'seen_', 'categories_'):
+            self.__dict__.pop(attribute, None)
+        return self.partial_fit(X, y)
+
+    def transform(self, X):
+        blocks = [self.scaler_.transform(X[self.numerical_cols])]
+        for col, categories in self.categories_.items():
+            codes = pd.Index(categories).get_indexer(X[col].astype(str))
+            onehot = np.zeros((len(X), len(categories)))
+            known = np.flatnonzero(codes >= 0)
+            onehot[known, codes[known]] = 1.0
+            blocks.append(onehot)
+        return np.hstack(blocks)
+
+    def get_feature_names_out(self, input_features=None):
+        names = list(self.numerical_cols)
+        for col, categories in self.categories_.items():
+            names += [f'{col}_{category}' for category in categories]
+        return np.asarray(names, dtype=object)
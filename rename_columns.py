@@ -1,46 +1,16 @@
 import pandas as pd
 
-# Load original data
-df = pd.read_csv('datos/data_ecommerce_customer_churn.csv')
+from data_store import MAPPING_PATH, load_dataset, localize
 
-print("Original columns:", df.columns.tolist())
+# The Spanish names are a view over the original English dataset: no
+# renamed copy is written, the mapping in datos/column_mapping.csv is
+# applied when the data is loaded (see data_store.localize).
+mapping_df = pd.read_csv(MAPPING_PATH)
+print("Mapeo de columnas (datos/column_mapping.csv):")
+print(mapping_df.to_string(index=False))
 
-# Rename columns to Spanish
-df.rename(columns={
-    'Tenure': 'Antiguedad',
-    'WarehouseToHome': 'Distancia_Almacen',
-    'NumberOfDeviceRegistered': 'Numero_Dispositivos',
-    'PreferedOrderCat': 'Categoria_Preferida',
-    'SatisfactionScore': 'Nivel_Satisfaccion',
-    'MaritalStatus': 'Estado_Civil',
-    'NumberOfAddress': 'Numero_Direcciones',
-    'Complain': 'Queja',
-    'DaySinceLastOrder': 'Dias_Ultima_Compra',
-    'CashbackAmount': 'Monto_Cashback',
-    'Churn': 'Target'
-}, inplace=True)
+df = load_dataset('crudo', locale='en')
+print("\nOriginal columns:", df.columns.tolist())
 
-print("\nRenamed columns:", df.columns.tolist())
-
-# Save renamed dataset
-df.to_csv('datos/data_ecommerce_customer_churn_es.csv', index=False)
-print("\n✅ Dataset saved to 'datos/data_ecommerce_customer_churn_es.csv'")
-
-# Also create a mapping file for reference
-mapping = {
-    'Tenure': 'Antiguedad',
-    'WarehouseToHome': 'Distancia_Almacen',
-    'NumberOfDeviceRegistered': 'Numero_Dispositivos',
-    'PreferedOrderCat': 'Categoria_Preferida',
-    'SatisfactionScore': 'Nivel_Satisfaccion',
-    'MaritalStatus': 'Estado_Civil',
-    'NumberOfAddress': 'Numero_Direcciones',
-    'Complain': 'Queja',
-    'DaySinceLastOrder': 'Dias_Ultima_Compra',
-    'CashbackAmount': 'Monto_Cashback',
-    'Churn': 'Target'
-}
-
-mapping_df = pd.DataFrame(list(mapping.items()), columns=['English', 'Spanish'])
-mapping_df.to_csv('datos/column_mapping.csv', index=False)
-print("✅ Column mapping saved to 'datos/column_mapping.csv'")
+df_es = localize(df, 'es', source='en')
+print("\nRenamed columns:", df_es.columns.tolist())
@@ -0,0 +1,359 @@
+"""Incremental runner for the pipeline stages.
+
+Each stage is fingerprinted with a content hash of its script (and the
+local modules it imports), its parameters, its input files and the
+library versions. Outputs are kept in .pipeline_cache/ under that
+fingerprint; a stage whose fingerprint has not changed is skipped and its
+outputs are restored from the cache if needed.
+
+Stages whose dependencies are done run concurrently in a process pool
+(``--workers``); each stage's output goes to .pipeline_cache/logs/. At
+the end the per-stage wall time and the critical path are reported.
+
+    python run_pipeline.py                  # whole pipeline
+    python run_pipeline.py segmentation     # a stage and its upstream stages
+    python run_pipeline.py --force modeling # rerun even if unchanged
+    python run_pipeline.py --workers 2      # at most two stages at a time
+"""
+import argparse
+import ast
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from importlib import metadata
+
+from data_store import DATASETS, source_path, storage_path
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.pipeline_cache')
+LOG_DIR = os.path.join(CACHE_DIR, 'logs')
+
+# Distributions whose version is part of every fingerprint
+LIBRARIES = ['numpy', 'pandas', 'scikit-learn', 'matplotlib', 'seaborn', 'pyarrow']
+
+# Stage graph. Inputs/outputs are dataset names from data_store.DATASETS
+# or file paths relative to the repository root.
+STAGES = {
+    'eda': {
+        'script': 'EDA/eda_script.py',
+        'args': [],
+        'deps': [],
+        'inputs': ['crudo'],
+        'outputs': ['limpio'],
+    },
+    'churn_definition': {
+        'script': 'Churn_Definition/churn_analysis.py',
+        'args': [],
+        'deps': ['eda'],
+        'inputs': ['limpio'],
+        'outputs': ['Churn_Definition/dias_ultima_compra_boxplot.png'],
+    },
+    'modeling': {
+        'script': 'Modeling/modeling_pipeline.py',
+        'args': [],
+        'deps': ['eda'],
+        'inputs': ['limpio'],
+        'outputs': [
+            'Modeling/cm_regresión_logística.png',
+            'Modeling/cm_árbol_de_decisión.png',
+            'Modeling/cm_random_forest.png',
+            'Modeling/cm_gradient_boosting.png',
+            'Modeling/feature_importance_rf.png',
+            'Modeling/curvas_umbral.png',
+        ],
+    },
+    'segmentation': {
+        'script': 'Segmentation/segmentation_analysis.py',
+        'args': [],
+        # modeling registers the Random Forest that segmentation loads
+        'deps': ['eda', 'modeling'],
+        'inputs': ['limpio'],
+        'outputs': ['segmentado', 'Segmentation/distribucion_segmentos_riesgo.png'],
+    },
+    'dashboard': {
+        'script': 'Dashboard/dashboard_generator.py',
+        'args': [],
+        'deps': ['churn_definition', 'modeling', 'segmentation'],
+        # Permutation importance written by modeling (importance.py)
+        'inputs': ['segmentado', 'modelos/random_forest/importance.json'],
+        'outputs': ['Dashboard/dashboard.html'],
+    },
+}
+
+
+def _input_path(entry):
+    return source_path(entry) if entry in DATASETS else os.path.join(ROOT, entry)
+
+
+def _output_path(entry):
+    return storage_path(entry) if entry in DATASETS else os.path.join(ROOT, entry)
+
+
+def file_hash(path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def local_modules(script):
+    """The script plus the repository modules it imports, recursively."""
+    found = []
+    pending = [os.path.join(ROOT, script)]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.append(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.append(node.module)
+        for name in names:
+            relative = name.replace('.', os.sep) + '.py'
+            for base in (os.path.dirname(path), ROOT):
+                candidate = os.path.join(base, relative)
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+                    break
+    return sorted(found)
+
+
+@functools.lru_cache(maxsize=None)
+def _library_versions():
+    versions = {'python': sys.version.split()[0]}
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def fingerprint(name):
+    """Content hash of a stage's code, parameters, inputs and environment."""
+    stage = STAGES[name]
+    parts = {
+        'code': {os.path.relpath(path, ROOT): file_hash(path)
+                 for path in local_modules(stage['script'])},
+        'args': stage['args'],
+        'inputs': {entry: file_hash(_input_path(entry)) for entry in stage['inputs']},
+        'outputs': [os.path.relpath(_output_path(entry), ROOT) for entry in stage['outputs']],
+        'environment': dict(_library_versions()),
+    }
+    payload = json.dumps(parts, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _cache_dir(name, key):
+    return os.path.join(CACHE_DIR, name, key)
+
+
+def restore_from_cache(name, key):
+    """Restore the cached outputs of ``name`` for ``key``; False on a miss."""
+    manifest_path = os.path.join(_cache_dir(name, key), 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for relpath, digest in manifest['outputs'].items():
+        cached = os.path.join(_cache_dir(name, key), relpath)
+        target = os.path.join(ROOT, relpath)
+        if not os.path.exists(cached):
+            return False
+        if not os.path.exists(target) or file_hash(target) != digest:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(cached, target)
+    return True
+
+
+def store_in_cache(name, key):
+    """Copy the current outputs of ``name`` into the cache under ``key``."""
+    cache_dir = _cache_dir(name, key)
+    outputs = {}
+    for entry in STAGES[name]['outputs']:
+        path = _output_path(entry)
+        relpath = os.path.relpath(path, ROOT)
+        os.makedirs(os.path.dirname(os.path.join(cache_dir, relpath)), exist_ok=True)
+        shutil.copy2(path, os.path.join(cache_dir, relpath))
+        outputs[relpath] = file_hash(path)
+    with open(os.path.join(cache_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'stage': name, 'fingerprint': key, 'outputs': outputs}, f, indent=2)
+
+
+def log_path(name):
+    return os.path.join(LOG_DIR, f'{name}.log')
+
+
+def run_script(name):
+    """Run a stage script from the repository root and return its exit code.
+
+    The script output is written to the stage log so concurrent stages do
+    not interleave on the console.
+    """
+    stage = STAGES[name]
+    env = dict(os.environ)
+    env.setdefault('MPLBACKEND', 'Agg')
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with open(log_path(name), 'w', encoding='utf-8') as log:
+        return subprocess.call([sys.executable, stage['script']] + stage['args'],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def execution_order(targets):
+    """Targets and their upstream stages in dependency order."""
+    order = []
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"Ciclo en el grafo de etapas: {' -> '.join(path + (name,))}")
+        if name in order:
+            return
+        for dep in STAGES[name]['deps']:
+            visit(dep, path + (name,))
+        order.append(name)
+
+    for name in targets:
+        visit(name)
+    return order
+
+
+def _modified_at(entry, path):
+    """Modification time of ``path(entry)``, or None when it does not exist."""
+    try:
+        return os.path.getmtime(path(entry))
+    except FileNotFoundError:  # also raised by source_path for a missing dataset
+        return None
+
+
+def run_stage(name, force=False):
+    """Run one stage unless its fingerprint is cached. Returns 'cached' or 'ran'.
+
+    Raises RuntimeError when an input is missing, the script fails or it
+    does not write every declared output (some scripts print an error and
+    exit with status 0).
+    """
+    stage = STAGES[name]
+    missing = [entry for entry in stage['inputs'] if _modified_at(entry, _input_path) is None]
+    if missing:
+        raise RuntimeError(f"Faltan entradas de la etapa '{name}': {', '.join(missing)}.")
+    key = fingerprint(name)
+    if not force and restore_from_cache(name, key):
+        return 'cached'
+    started = time.time()
+    if run_script(name) != 0:
+        raise RuntimeError(f"La etapa '{name}' terminó con error.")
+    # Outputs left over from an earlier run do not count
+    missing = [entry for entry in stage['outputs']
+               if (_modified_at(entry, _output_path) or 0) < started]
+    if missing:
+        raise RuntimeError(f"La etapa '{name}' no generó sus salidas: {', '.join(missing)}.")
+    store_in_cache(name, key)
+    return 'ran'
+
+
+def _timed_stage(name, force):
+    start = time.perf_counter()
+    status = run_stage(name, force=force)
+    return status, time.perf_counter() - start
+
+
+def run_graph(names, workers=None, force=()):
+    """Run ``names`` (closed under dependencies) with at most ``workers`` at once.
+
+    Returns {stage: (status, seconds)}; status is 'ran', 'cached', 'failed'
+    or 'skipped' (an upstream stage failed).
+    """
+    results = {}
+    remaining = list(names)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while remaining or running:
+            for name in list(remaining):
+                deps = STAGES[name]['deps']
+                if any(results.get(dep, ('',))[0] in ('failed', 'skipped') for dep in deps):
+                    results[name] = ('skipped', 0.0)
+                    remaining.remove(name)
+                    print(f"[{name}] omitida: falló una etapa previa")
+                elif all(dep in results for dep in deps):
+                    running[pool.submit(_timed_stage, name, name in force)] = name
+                    remaining.remove(name)
+                    print(f"[{name}] iniciada")
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except RuntimeError as error:
+                    results[name] = ('failed', 0.0)
+                    print(f"[{name}] error: {error} Ver {os.path.relpath(log_path(name))}")
+                    continue
+                status, elapsed = results[name]
+                label = 'sin cambios, omitida' if status == 'cached' else 'ejecutada'
+                print(f"[{name}] {label} ({elapsed:.1f}s)")
+    return results
+
+
+def critical_path(results):
+    """Longest chain of dependent stages by wall time: (stages, seconds)."""
+    finish = {}
+    previous = {}
+    for name in execution_order(list(results)):
+        deps = [dep for dep in STAGES[name]['deps'] if dep in results]
+        slowest = max(deps, key=lambda dep: finish[dep], default=None)
+        previous[name] = slowest
+        finish[name] = results[name][1] + (finish[slowest] if slowest else 0.0)
+    last = max(finish, key=finish.get)
+    path = [last]
+    while previous[path[-1]]:
+        path.append(previous[path[-1]])
+    return path[::-1], finish[last]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ejecuta el pipeline de churn de forma incremental.')
+    parser.add_argument('stages', nargs='*',
+                        help=f"Etapas a ejecutar (por defecto, todas): {', '.join(STAGES)}. "
+                             "Incluye sus dependencias.")
+    parser.add_argument('--force', action='store_true',
+                        help='Volver a ejecutar las etapas aunque su huella no haya cambiado.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Máximo de etapas ejecutándose en paralelo (por defecto, núcleos disponibles).')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"Etapas desconocidas: {', '.join(unknown)}")
+
+    names = execution_order(args.stages or list(STAGES))
+    force = (args.stages or names) if args.force else ()
+    start = time.perf_counter()
+    results = run_graph(names, workers=max(args.workers, 1), force=force)
+    wall_time = time.perf_counter() - start
+
+    print("\n--- Tiempo por Etapa ---")
+    for name in names:
+        status, elapsed = results[name]
+        print(f"  {name:<18} {status:<8} {elapsed:6.1f}s")
+    path, path_time = critical_path(results)
+    print(f"Ruta crítica: {' -> '.join(path)} ({path_time:.1f}s)")
+    print(f"Tiempo total: {wall_time:.1f}s")
+    if any(status in ('failed', 'skipped') for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+"""Mergeable statistics for processing the customer table in chunks.
+
+The accumulators here are updated one chunk at a time and two partial
+states can be merged, so a dataset larger than memory can be profiled
+with peak memory bounded by the chunk size, and partitions can be
+profiled in separate processes and combined (``profile_chunks``).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Numeric columns keep exact value counts (for an exact median) while they
+# have at most this many distinct values; past it only the sketch is kept.
+MAX_EXACT_DISTINCT = 10_000
+
+
+class KLLSketch:
+    """KLL-style quantile sketch over a stream of floats.
+
+    Items are kept in levels; an item on level ``h`` stands for ``2**h``
+    original values. When a level exceeds its capacity it is sorted and
+    every other item (random offset) is promoted to the next level. Rank
+    error is O(1/k) and memory is O(k) regardless of the stream length.
+    Every retained item is an actual value of the stream.
+    """
+
+    # Normalized rank error is about ERROR_CONSTANT / k (with high probability)
+    ERROR_CONSTANT = 3.0
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, error, seed=None):
+        """Sketch sized so quantiles are within ``error`` in rank (e.g. 0.01)."""
+        if not 0 < error < 1:
+            raise ValueError(f"El error debe estar entre 0 y 1: {error}")
+        return cls(k=max(int(np.ceil(cls.ERROR_CONSTANT / error)), 8), seed=seed)
+
+    @property
+    def rank_error(self):
+        """Approximate normalized rank error of the quantiles."""
+        return self.ERROR_CONSTANT / self.k
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                leftover = items[:items.size % 2]
+                items = items[items.size % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add an array of values (NaN are ignored)."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate quantile(s) ``q`` in [0, 1]; NaN for an empty sketch."""
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        items, weights = self.items()
+        cum_weights = np.cumsum(weights)
+        idx = np.searchsorted(cum_weights, q * cum_weights[-1], side='left')
+        result = items[np.clip(idx, 0, items.size - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result if q.ndim else float(result)
+
+    def items(self):
+        """Retained items with their weights, sorted by value."""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level_items.size, 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def box_stats(self, whis=1.5):
+        """Box-plot statistics in the format of ``matplotlib.cbook.boxplot_stats``.
+
+        Quartiles are approximate; whiskers are the most extreme retained
+        values within ``whis`` * IQR of the box, and ``fliers`` are the
+        retained values beyond them (a sample of the outliers).
+        """
+        q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        items, _ = self.items()
+        values = np.concatenate([[self.min, self.max], items]) if self.n else items
+        inside = values[(values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)]
+        whislo = inside.min() if inside.size else q1
+        whishi = inside.max() if inside.size else q3
+        fliers = np.unique(values[(values < whislo) | (values > whishi)])
+        return {'med': med, 'q1': q1, 'q3': q3, 'iqr': iqr,
+                'whislo': whislo, 'whishi': whishi, 'fliers': fliers}
+
+
+class StreamingProfile:
+    """Per-column statistics accumulated chunk by chunk in a single scan.
+
+    Tracks the row count, null counts, min/max, a quantile sketch per
+    numeric column, exact value counts of the non-numeric columns (plus
+    any numeric ``count_columns``), exact value counts of the numeric
+    columns up to ``MAX_EXACT_DISTINCT`` distinct values and the pairwise
+    co-moments of the numeric columns. Moments are combined with the parallel form of
+    Welford's algorithm (Chan et al.), so merging two partial states gives
+    the same count, mean, variance and covariance as a single scan.
+    Covariances use pairwise-complete observations, like ``DataFrame.cov``.
+    Numeric/non-numeric columns are fixed by the dtypes of the first chunk.
+    """
+
+    def __init__(self, sketch_k=200, seed=0, count_columns=()):
+        self.sketch_k = sketch_k
+        self.seed = seed
+        self.count_columns = list(count_columns)
+        self.rows = 0
+        self.columns = None
+        self.numeric_columns = None
+        self.nulls = None
+        self.min = None
+        self.max = None
+        self.sketches = {}
+        self.value_counts = {}
+        self.exact_counts = {}
+        # Pairwise state over the rows where numeric columns i and j are both
+        # present: number of rows, mean of column i, sum of squared deviations
+        # of column i, and co-moment of i and j.
+        self.pair_count = None
+        self.pair_mean = None
+        self.pair_m2 = None
+        self.comoment = None
+
+    def _init_columns(self, columns, numeric_columns):
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns)
+        p = len(self.numeric_columns)
+        self.nulls = pd.Series(0, index=self.columns, dtype='int64')
+        self.min = np.full(p, np.inf)
+        self.max = np.full(p, -np.inf)
+        self.pair_count = np.zeros((p, p))
+        self.pair_mean = np.zeros((p, p))
+        self.pair_m2 = np.zeros((p, p))
+        self.comoment = np.zeros((p, p))
+        self.sketches = {col: KLLSketch(self.sketch_k, seed=self.seed + i)
+                         for i, col in enumerate(self.numeric_columns)}
+        self.value_counts = {col: pd.Series(dtype='int64') for col in self.columns
+                             if col not in self.numeric_columns or col in self.count_columns}
+        self.exact_counts = {col: pd.Series(dtype='int64') for col in self.numeric_columns}
+
+    def _add_exact_counts(self, col, counts):
+        # None once the column has too many distinct values to count exactly
+        if self.exact_counts[col] is None or counts is None:
+            self.exact_counts[col] = None
+            return
+        merged = self.exact_counts[col].add(counts, fill_value=0).astype('int64')
+        self.exact_counts[col] = merged if len(merged) <= MAX_EXACT_DISTINCT else None
+
+    @property
+    def count(self):
+        return np.diag(self.pair_count).copy()
+
+    @property
+    def mean(self):
+        return np.diag(self.pair_mean).copy()
+
+    @property
+    def m2(self):
+        return np.diag(self.comoment).copy()
+
+    def _merge_moments(self, count, mean, m2, comoment):
+        total = self.pair_count + count
+        weight = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+        cross = np.divide(self.pair_count * count, total, out=np.zeros_like(total), where=total > 0)
+        delta = mean - self.pair_mean
+        self.pair_mean = self.pair_mean + delta * weight
+        self.pair_m2 = self.pair_m2 + m2 + delta ** 2 * cross
+        self.comoment = self.comoment + comoment + delta * delta.T * cross
+        self.pair_count = total
+
+    def update(self, chunk):
+        """Add the rows of a DataFrame chunk."""
+        if self.columns is None:
+            self._init_columns(chunk.columns, [col for col in chunk.columns
+                                               if pd.api.types.is_numeric_dtype(chunk[col])])
+        self.rows += len(chunk)
+        self.nulls = self.nulls.add(chunk[self.columns].isna().sum(), fill_value=0).astype('int64')
+
+        if self.numeric_columns and len(chunk):
+            values = chunk[self.numeric_columns].to_numpy(dtype=float, na_value=np.nan)
+            valid = ~np.isnan(values)
+            mask = valid.astype(float)
+            # Center on the chunk means to keep the sums well conditioned
+            center = np.nansum(values, axis=0) / np.maximum(valid.sum(axis=0), 1)
+            centered = np.where(valid, values - center, 0.0)
+            count = mask.T @ mask
+            sums = centered.T @ mask
+            squares = (centered ** 2).T @ mask
+            cross = centered.T @ centered
+            safe_count = np.maximum(count, 1)
+            mean = center[:, None] + sums / safe_count
+            m2 = squares - sums ** 2 / safe_count
+            comoment = cross - sums * sums.T / safe_count
+            self._merge_moments(count, mean, m2, comoment)
+            self.min = np.fmin(self.min, np.where(valid, values, np.inf).min(axis=0))
+            self.max = np.fmax(self.max, np.where(valid, values, -np.inf).max(axis=0))
+            for i, col in enumerate(self.numeric_columns):
+                self.sketches[col].update(values[:, i])
+                if self.exact_counts[col] is not None:
+                    self._add_exact_counts(col, pd.Series(values[valid[:, i], i]).value_counts())
+
+        for col in self.value_counts:
+            counts = chunk[col].value_counts()
+            self.value_counts[col] = self.value_counts[col].add(counts, fill_value=0).astype('int64')
+        return self
+
+    def merge(self, other):
+        """Fold the state of ``other`` (same columns) into this profile."""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.count_columns = list(other.count_columns)
+            self._init_columns(other.columns, other.numeric_columns)
+        self.rows += other.rows
+        self.nulls = self.nulls.add(other.nulls, fill_value=0).astype('int64')
+        self._merge_moments(other.pair_count, other.pair_mean, other.pair_m2, other.comoment)
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        for col, sketch in other.sketches.items():
+            self.sketches[col].merge(sketch)
+            self._add_exact_counts(col, other.exact_counts[col])
+        for col, counts in other.value_counts.items():
+            self.value_counts[col] = self.value_counts[col].add(counts, fill_value=0).astype('int64')
+        return self
+
+    def median_is_exact(self, col):
+        return self.exact_counts[col] is not None
+
+    def median(self, col):
+        """Exact median (as ``Series.median``) while the distinct values are
+        counted, otherwise the sketch's approximation."""
+        counts = self.exact_counts[col]
+        if counts is None:
+            return self.sketches[col].quantile(0.5)
+        if not len(counts):
+            return np.nan
+        counts = counts.sort_index()
+        cumulative = counts.to_numpy().cumsum()
+        n = cumulative[-1]
+        middle = np.searchsorted(cumulative, [(n - 1) // 2, n // 2], side='right')
+        return float(counts.index[middle].to_numpy(dtype=float).mean())
+
+    def mode(self, col):
+        counts = self.value_counts[col]
+        return counts.idxmax() if len(counts) else np.nan
+
+    def fill_values(self):
+        """Imputation value for each column with nulls: mode (non-numeric) or median."""
+        return {col: (self.median(col) if col in self.sketches else self.mode(col))
+                for col in self.columns if self.nulls[col] > 0}
+
+    def frequencies(self, col, normalize=False):
+        """Equivalent of ``Series.value_counts()`` for a counted column."""
+        counts = self.value_counts[col].sort_values(ascending=False)
+        if normalize:
+            return (counts / counts.sum()).rename('proportion')
+        return counts.rename('count')
+
+    def describe(self):
+        """Approximate equivalent of ``DataFrame.describe()`` for numeric columns."""
+        count = self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (count - 1))
+        quantiles = np.array([self.sketches[col].quantile([0.25, 0.5, 0.75])
+                              for col in self.numeric_columns]).reshape(-1, 3)
+        return pd.DataFrame({
+            'count': count,
+            'mean': self.mean,
+            'std': std,
+            'min': np.where(count > 0, self.min, np.nan),
+            '25%': quantiles[:, 0],
+            '50%': quantiles[:, 1],
+            '75%': quantiles[:, 2],
+            'max': np.where(count > 0, self.max, np.nan),
+        }, index=self.numeric_columns).T
+
+    def cov(self):
+        """Equivalent of ``DataFrame.cov()`` for the numeric columns."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.comoment / (self.pair_count - 1)
+        return pd.DataFrame(cov, index=self.numeric_columns, columns=self.numeric_columns)
+
+    def corr(self):
+        """Equivalent of ``DataFrame.corr()`` (Pearson) for the numeric columns."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.pair_m2 * self.pair_m2.T)
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.numeric_columns,
+                            columns=self.numeric_columns)
+
+
+def _profile_chunk(chunk, sketch_k, seed, count_columns):
+    return StreamingProfile(sketch_k, seed, count_columns).update(chunk)
+
+
+def profile_chunks(chunks, n_jobs=1, sketch_k=200, seed=0, count_columns=()):
+    """Profile an iterable of DataFrame chunks, optionally across processes.
+
+    With ``n_jobs > 1`` each chunk is profiled in a worker process and the
+    partial states are merged in chunk order. At most ``2 * n_jobs`` chunks
+    are in flight, so memory stays bounded by the chunk size.
+    """
+    profile = StreamingProfile(sketch_k, seed, count_columns)
+    if n_jobs <= 1:
+        for chunk in chunks:
+            profile.update(chunk)
+        return profile
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_profile_chunk, chunk, sketch_k, seed, count_columns))
+            if len(pending) >= 2 * n_jobs:
+                profile.merge(pending.pop(0).result())
+        for future in pending:
+            profile.merge(future.result())
+    return profile
+
+
+def profile_frame(df, n_jobs=1, sketch_k=200, seed=0, count_columns=()):
+    """Profile an in-memory DataFrame, split in one partition per process."""
+    partitions = max(n_jobs, 1)
+    size = -(-len(df) // partitions) or 1
+    chunks = (df.iloc[start:start + size] for start in range(0, len(df), size))
+    return profile_chunks(chunks, n_jobs, sketch_k, seed, count_columns)
+
+
+def _combine_moments(a, b):
+    """Merge two (count, mean, M2) triples (Chan et al.)."""
+    count = a[0] + b[0]
+    if count == 0:
+        return a
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / count
+    m2 = a[2] + b[2] + delta ** 2 * a[0] * b[0] / count
+    return (count, mean, m2)
+
+
+class GroupedQuantiles:
+    """Quantile sketch and moments of one value column per group.
+
+    Replaces ``df.groupby(group)[value].describe()`` and box plots when the
+    column does not fit in memory: update it chunk by chunk, merge states
+    built by different workers, and read approximate quantiles within
+    ``error`` in rank.
+    """
+
+    def __init__(self, error=0.01, seed=0):
+        self.error = error
+        self.seed = seed
+        self.sketches = {}
+        self.moments = {}
+
+    def _sketch(self, group):
+        if group not in self.sketches:
+            self.sketches[group] = KLLSketch.for_error(self.error, seed=self.seed + len(self.sketches))
+            self.moments[group] = (0, 0.0, 0.0)
+        return self.sketches[group]
+
+    def update(self, values, groups):
+        """Add ``values`` labelled by ``groups`` (array-likes of equal length)."""
+        frame = pd.DataFrame({'value': np.asarray(values, dtype=float), 'group': np.asarray(groups)})
+        frame = frame.dropna()
+        for group, part in frame.groupby('group', sort=False)['value']:
+            values = part.to_numpy()
+            self._sketch(group).update(values)
+            chunk_mean = values.mean()
+            chunk = (values.size, chunk_mean, ((values - chunk_mean) ** 2).sum())
+            self.moments[group] = _combine_moments(self.moments[group], chunk)
+        return self
+
+    def merge(self, other):
+        """Fold the state of ``other`` into this one."""
+        for group, sketch in other.sketches.items():
+            self._sketch(group).merge(sketch)
+            self.moments[group] = _combine_moments(self.moments[group], other.moments[group])
+        return self
+
+    def describe(self):
+        """Approximate equivalent of ``groupby(group)[value].describe()``."""
+        rows = {}
+        for group in sorted(self.sketches):
+            sketch = self.sketches[group]
+            count, mean, m2 = self.moments[group]
+            q1, med, q3 = sketch.quantile([0.25, 0.5, 0.75])
+            rows[group] = {
+                'count': float(count),
+                'mean': mean,
+                'std': np.sqrt(m2 / (count - 1)) if count > 1 else np.nan,
+                'min': sketch.min,
+                '25%': q1,
+                '50%': med,
+                '75%': q3,
+                'max': sketch.max,
+            }
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def box_stats(self, whis=1.5, groups=None):
+        """Per-group box-plot statistics, ready for ``Axes.bxp``."""
+        stats = []
+        for group in (sorted(self.sketches) if groups is None else groups):
+            box = self.sketches[group].box_stats(whis)
+            count, mean, m2 = self.moments[group]
+            box.update(label=group, mean=mean,
+                       std=np.sqrt(m2 / (count - 1)) if count > 1 else np.nan)
+            stats.append(box)
+        return stats
@@ -0,0 +1,68 @@
+"""batch_scoring.py: same output in one process and in N workers, and in English."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Segmentation'))
+
+import model_registry
+from batch_scoring import score_file
+from data_store import RISK_SEGMENT_LABELS, load_dataset, localize, read_file
+from forest_arrays import with_missing
+from model_registry import CHURN_MODEL, CHURN_MODEL_VERSION, data_hash, fit_churn_model, save_model
+
+
+def _register_forest(tmp_path, monkeypatch):
+    """Register a small forest in a temporary registry; returns (pipeline, features frame)."""
+    monkeypatch.setattr(model_registry, 'REGISTRY_DIR', str(tmp_path / 'modelos'))
+    df = load_dataset('limpio')
+    X = df.drop(columns='Target')
+    params = {'n_estimators': 20, 'random_state': 0}
+    pipeline, extra = fit_churn_model(X, df['Target'], params)
+    save_model(CHURN_MODEL, pipeline, data_hash(df), params, CHURN_MODEL_VERSION, **extra)
+    return pipeline, X
+
+
+def test_jobs_match_single_process_with_missing_values(tmp_path, monkeypatch):
+    pipeline, X = _register_forest(tmp_path, monkeypatch)
+
+    # Complete rows plus a copy with missing cells in the columns that have
+    # them in the raw extract (the float ones; the schema keeps ints complete)
+    numerical = X.select_dtypes(include=['float64']).columns
+    customers = with_missing(X.iloc[:1_000], numerical)
+    assert customers.isna().any(axis=1).sum() > 0
+    source = tmp_path / 'clientes.parquet'
+    customers.to_parquet(source)
+
+    outputs = {}
+    for jobs in (1, 2):
+        path = tmp_path / f'puntuados_{jobs}.parquet'
+        score_file(str(source), str(path), chunksize=300, n_jobs=jobs)
+        outputs[jobs] = read_file(str(path))
+    pd.testing.assert_frame_equal(outputs[1], outputs[2])
+    expected = pipeline.predict_proba(customers)[:, 1]
+    np.testing.assert_array_equal(outputs[2]['Probabilidad_Churn'].to_numpy(), expected)
+
+
+def test_english_input_and_output(tmp_path, monkeypatch):
+    pipeline, X = _register_forest(tmp_path, monkeypatch)
+    customers = X.iloc[:500]
+    source = tmp_path / 'customers.parquet'
+    localize(customers, 'en').to_parquet(source)
+
+    path = tmp_path / 'scored.parquet'
+    score_file(str(source), str(path), chunksize=200, locale='en')
+    scored = pd.read_parquet(path)
+    assert list(scored.columns[-2:]) == ['Churn_Probability', 'Risk_Segment']
+    assert set(scored['Risk_Segment']) <= set(RISK_SEGMENT_LABELS['en'])
+    np.testing.assert_array_equal(scored['Churn_Probability'].to_numpy(),
+                                  pipeline.predict_proba(customers)[:, 1])
+    # Read back under the canonical names it matches the Spanish run
+    spanish = tmp_path / 'puntuados.parquet'
+    customers.to_parquet(tmp_path / 'clientes.parquet')
+    score_file(str(tmp_path / 'clientes.parquet'), str(spanish), chunksize=200)
+    pd.testing.assert_frame_equal(read_file(str(path), source_locale='en'), read_file(str(spanish)))